@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare GraphSearch.find_shortest_path (breadth-first) against the original
+recursive depth-first implementation on random directed graphs.
+
+The recursive search enumerates every simple path, so it is only run on
+graphs small enough to finish; on the larger sizes only the breadth-first
+search is timed.
+
+It also times batch_shortest_paths with a growing number of worker
+processes, the start-up time of a memory-mapped graph file against
+building a CompactGraph, compares the nodes expanded by find_path with the 'bfs' and
+'bidirectional' strategies on sparse graphs, and reports the memory taken by the dict-of-lists form and by a
+CompactGraph for the same graph.
+
+    PYTHONPATH=. python benchmarks/bench_graph_search.py
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from patterns.other.graph_search import CompactGraph, GraphSearch, load_graph, save_graph
+
+SMALL_SIZES = (8, 10, 12)
+LARGE_SIZES = (1000, 10000, 100000)
+DEGREE = 8
+QUERIES = 20
+
+
+def random_graph(nodes, degree, seed=0):
+    rnd = random.Random(seed)
+    return {n: rnd.sample(range(nodes), min(degree, nodes)) for n in range(nodes)}
+
+
+def recursive_shortest_path(graph, start, end, path=None):
+    """The implementation GraphSearch.find_shortest_path used to have."""
+    path = path or []
+    path.append(start)
+
+    if start == end:
+        return path
+    shortest = None
+    for node in graph.get(start, []):
+        if node not in path:
+            newpath = recursive_shortest_path(graph, node, end, path[:])
+            if newpath:
+                if not shortest or len(newpath) < len(shortest):
+                    shortest = newpath
+    return shortest
+
+
+def queries(nodes, seed=1):
+    rnd = random.Random(seed)
+    return [(rnd.randrange(nodes), rnd.randrange(nodes)) for _ in range(QUERIES)]
+
+
+def bench(nodes, degree, with_recursive):
+    graph = random_graph(nodes, degree)
+    search = GraphSearch(graph)
+    pairs = queries(nodes)
+
+    bfs = min(timeit.repeat(lambda: [search.find_shortest_path(s, e) for s, e in pairs], number=1, repeat=3))
+    if not with_recursive:
+        return bfs, None
+
+    for s, e in pairs:
+        expected = recursive_shortest_path(graph, s, e)
+        assert len(search.find_shortest_path(s, e) or []) == len(expected or [])
+    dfs = min(timeit.repeat(lambda: [recursive_shortest_path(graph, s, e) for s, e in pairs], number=1, repeat=3))
+    return bfs, dfs
+
+
+def bench_strategies(nodes, degree):
+    search = GraphSearch(random_graph(nodes, degree))
+    expanded = {'bfs': 0, 'bidirectional': 0}
+    for s, e in queries(nodes):
+        for strategy in expanded:
+            search.find_path(s, e, strategy=strategy)
+            expanded[strategy] += search.nodes_expanded
+    return expanded['bfs'] / float(QUERIES), expanded['bidirectional'] / float(QUERIES)
+
+
+def bench_batch(nodes, degree, sources, workers):
+    search = GraphSearch(CompactGraph.from_dict(random_graph(nodes, degree)))
+    targets = range(0, nodes, max(1, nodes // 100))
+    begin = time.time()
+    for _ in search.batch_shortest_paths(range(sources), targets, workers=workers):
+        pass
+    return time.time() - begin
+
+
+def bench_startup(nodes, degree):
+    rnd = random.Random(0)
+    graph = {str(n): [str(i) for i in rnd.sample(range(nodes), degree)] for n in range(nodes)}
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "graph.bin")
+        save_graph(graph, path)
+
+        begin = time.time()
+        GraphSearch(CompactGraph.from_dict(graph)).find_shortest_path("0", "1")
+        built = time.time() - begin
+
+        begin = time.time()
+        mapped = load_graph(path)
+        GraphSearch(mapped).find_shortest_path("0", "1")
+        loaded = time.time() - begin
+        mapped.close()
+    finally:
+        shutil.rmtree(directory)
+    return built, loaded
+
+
+def allocated(build):
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def bench_memory(nodes, degree):
+    rnd = random.Random(0)
+    names = ["node-{}".format(n) for n in range(nodes)]
+
+    def build_dict():
+        return {name: [names[i] for i in rnd.sample(range(nodes), degree)] for name in names}
+
+    graph = build_dict()
+    as_dict = allocated(build_dict)
+    compact = allocated(lambda: CompactGraph.from_dict(graph))
+    edges = nodes * degree
+    return as_dict / float(edges), compact / float(edges)
+
+
+def main():
+    print("{:>8} {:>7} {:>14} {:>14}".format("nodes", "degree", "bfs ms/query", "dfs ms/query"))
+    for nodes in SMALL_SIZES + LARGE_SIZES:
+        bfs, dfs = bench(nodes, min(DEGREE, nodes // 2), nodes in SMALL_SIZES)
+        print(
+            "{:>8} {:>7} {:>14.3f} {:>14}".format(
+                nodes,
+                min(DEGREE, nodes // 2),
+                bfs * 1000 / QUERIES,
+                "-" if dfs is None else "{:.3f}".format(dfs * 1000 / QUERIES),
+            )
+        )
+
+    print()
+    print("{:>8} {:>7} {:>16} {:>16}".format("nodes", "degree", "bfs expanded", "bidir expanded"))
+    for nodes in LARGE_SIZES:
+        bfs, bidirectional = bench_strategies(nodes, 3)
+        print("{:>8} {:>7} {:>16.0f} {:>16.0f}".format(nodes, 3, bfs, bidirectional))
+
+    print()
+    print("{:>8} {:>8} {:>8} {:>10}".format("nodes", "sources", "workers", "seconds"))
+    cpus = multiprocessing.cpu_count()
+    for workers in sorted(set([1, 2, 4, cpus])):
+        if workers <= cpus:
+            print("{:>8} {:>8} {:>8} {:>10.2f}".format(10000, 400, workers, bench_batch(10000, DEGREE, 400, workers)))
+
+    print()
+    print("{:>8} {:>7} {:>16} {:>16}".format("nodes", "degree", "from_dict s", "load_graph s"))
+    for nodes in LARGE_SIZES:
+        built, loaded = bench_startup(nodes, DEGREE)
+        print("{:>8} {:>7} {:>16.3f} {:>16.3f}".format(nodes, DEGREE, built, loaded))
+
+    print()
+    print("{:>8} {:>7} {:>16} {:>16}".format("nodes", "degree", "dict B/edge", "compact B/edge"))
+    for nodes in LARGE_SIZES:
+        as_dict, compact = bench_memory(nodes, DEGREE)
+        print("{:>8} {:>7} {:>16.1f} {:>16.1f}".format(nodes, DEGREE, as_dict, compact))
+
+
+if __name__ == "__main__":
+    main()
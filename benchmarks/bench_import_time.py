@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Import cost of the pattern packages, measured with `python -X importtime`.
+
+For each subpackage this compares importing the package alone (its modules
+load lazily), importing the package and touching one exported class, and
+importing every module of the package up front, which is what an eager
+__init__ would cost.
+
+    PYTHONPATH=. python benchmarks/bench_import_time.py
+"""
+
+from __future__ import print_function
+
+import importlib
+import os
+import pkgutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGES = {
+    'patterns.behavioral': 'Provider',
+    'patterns.creational': 'BoundedPool',
+    'patterns.structural': 'Proxy',
+    'patterns.other': 'GraphSearch',
+}
+RUNS = 5
+
+
+def total_import_time(code):
+    """Microseconds spent importing modules while running `code`, best of RUNS."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    best = None
+    for _ in range(RUNS):
+        stderr = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code], env=env, stderr=subprocess.PIPE, check=True
+        ).stderr.decode()
+        total = 0
+        for line in stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            fields = line.split('|')
+            if len(fields) == 3 and fields[0].split(':')[1].strip().isdigit():
+                total += int(fields[0].split(':')[1])
+        best = total if best is None else min(best, total)
+    return best
+
+
+def import_time(code, baseline):
+    return max(0, total_import_time(code) - baseline)
+
+
+def main():
+    baseline = total_import_time('import importlib')
+    print("{:>22} {:>12} {:>16} {:>16}".format("package", "import us", "+ one class us", "all modules us"))
+    for package, name in sorted(PACKAGES.items()):
+        path = importlib.import_module(package).__path__
+        eager = 'import importlib\n' + '\n'.join(
+            "importlib.import_module('{}.{}')".format(package, module)
+            for _, module, _ in pkgutil.iter_modules(path)
+            if not module.endswith('__py2')
+        )
+        print(
+            "{:>22} {:>12} {:>16} {:>16}".format(
+                package,
+                import_time('import ' + package, baseline),
+                import_time('import {0}; {0}.{1}'.format(package, name), baseline),
+                import_time(eager, baseline),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
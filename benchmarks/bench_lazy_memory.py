@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Memory taken by many Person objects (lazy_property, value cached in
+__dict__) against SlottedPerson objects (lazy_slot_property, value cached
+in a slot), before and after the lazy attribute is computed.
+
+    PYTHONPATH=. python benchmarks/bench_lazy_memory.py
+"""
+
+from __future__ import print_function
+
+import tracemalloc
+
+from patterns.creational.lazy_evaluation import Person, SlottedPerson
+
+COUNT = 100000
+
+
+def measure(cls, touch):
+    tracemalloc.start()
+    people = [cls('John', 'Coder') for _ in range(COUNT)]
+    if touch:
+        for person in people:
+            person.relatives
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / float(COUNT)
+
+
+def main():
+    print("{:>14} {:>16} {:>16}".format("class", "bytes/object", "after access"))
+    for cls in (Person, SlottedPerson):
+        print("{:>14} {:>16.1f} {:>16.1f}".format(cls.__name__, measure(cls, False), measure(cls, True)))
+
+
+if __name__ == "__main__":
+    main()
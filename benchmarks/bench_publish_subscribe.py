@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Time Provider.update() delivering many small messages to subscribers that
+handle one message per run() call against subscribers that implement
+run_batch() and receive all their messages in one call, and the cost of
+notify() without a MessageLog and with one under each fsync policy.
+
+    PYTHONPATH=. python benchmarks/bench_publish_subscribe.py
+"""
+
+from __future__ import print_function
+
+import shutil
+import tempfile
+import timeit
+
+from patterns.behavioral.publish_subscribe import MessageLog, Provider
+
+MESSAGES = 100000
+TOPICS = ['orders.eu.created', 'orders.us.created', 'orders.eu.cancelled', 'users.signup']
+
+
+class Counter(object):
+    def __init__(self):
+        self.count = 0
+
+    def run(self, msg):
+        self.count += 1
+
+
+class BatchCounter(Counter):
+    def run_batch(self, msgs):
+        self.count += len(msgs)
+
+
+def bench(cls, subscribers):
+    provider = Provider()
+    counters = [cls() for _ in range(subscribers)]
+    for counter in counters:
+        provider.subscribe('orders.#', counter)
+
+    def publish_and_update():
+        for i in range(MESSAGES):
+            provider.notify(TOPICS[i % len(TOPICS)])
+        provider.update()
+
+    seconds = min(timeit.repeat(publish_and_update, number=1, repeat=3))
+    assert counters[0].count == 3 * (MESSAGES * 3 // 4)
+    return seconds
+
+
+def bench_notify(fsync):
+    directory = tempfile.mkdtemp()
+    try:
+        log = None if fsync is None else MessageLog(directory, fsync=fsync)
+        provider = Provider(log=log)
+        count = MESSAGES if fsync != 'always' else MESSAGES // 100
+
+        def notify():
+            for i in range(count):
+                provider.notify(TOPICS[i % len(TOPICS)])
+            provider.msg_queue = []
+
+        seconds = min(timeit.repeat(notify, number=1, repeat=3))
+        if log is not None:
+            log.close()
+    finally:
+        shutil.rmtree(directory)
+    return seconds * 1e6 / count
+
+
+def main():
+    print("{:>12} {:>10} {:>14} {:>14}".format("subscribers", "messages", "run() s", "run_batch() s"))
+    for subscribers in (1, 10, 50):
+        print(
+            "{:>12} {:>10} {:>14.3f} {:>14.3f}".format(
+                subscribers, MESSAGES, bench(Counter, subscribers), bench(BatchCounter, subscribers)
+            )
+        )
+
+    print()
+    print("{:>12} {:>14}".format("log fsync", "notify us/msg"))
+    for fsync in (None, 'never', 'interval', 'always'):
+        print("{:>12} {:>14.2f}".format(fsync or "no log", bench_notify(fsync)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Throughput of fanning messages out to worker processes through a
+SharedMemoryProvider against one multiprocessing.Queue per worker. The
+time runs from the first message published to the last worker having
+received every message.
+
+    PYTHONPATH=. python benchmarks/bench_publish_subscribe_shm.py
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import time
+
+from patterns.behavioral.publish_subscribe_shm import SharedMemoryProvider, SharedMemoryReader
+
+MESSAGES = 200000
+TOPICS = ['orders.eu.created', 'orders.us.created', 'orders.eu.cancelled', 'users.signup']
+
+
+class Counter(object):
+    def __init__(self):
+        self.count = 0
+
+    def run(self, msg):
+        self.count += 1
+
+
+def shm_worker(handle, ready, done):
+    counter = Counter()
+    with SharedMemoryReader(handle) as reader:
+        reader.subscribe('#', counter)
+        ready.set()
+        while not reader.closed:
+            if not reader.update():
+                time.sleep(0.0001)
+        reader.update()
+    done.put(counter.count)
+
+
+def queue_worker(messages, ready, done):
+    ready.set()
+    count = 0
+    while True:
+        msg = messages.get()
+        if msg is None:
+            break
+        count += 1
+    done.put(count)
+
+
+def bench_shm(workers):
+    provider = SharedMemoryProvider(capacity=1 << 22, max_readers=workers)
+    try:
+        ready = [multiprocessing.Event() for _ in range(workers)]
+        done = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=shm_worker, args=(provider.add_reader(), event, done)) for event in ready
+        ]
+        for process in processes:
+            process.start()
+        for event in ready:
+            event.wait()
+        begin = time.time()
+        for i in range(MESSAGES):
+            provider.notify(TOPICS[i % 4])
+        provider.close()
+        counts = [done.get() for _ in processes]
+        elapsed = time.time() - begin
+        for process in processes:
+            process.join()
+    finally:
+        provider.unlink()
+    assert counts == [MESSAGES] * workers
+    return elapsed
+
+
+def bench_queue(workers):
+    queues = [multiprocessing.Queue() for _ in range(workers)]
+    ready = [multiprocessing.Event() for _ in range(workers)]
+    done = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=queue_worker, args=(messages, event, done))
+        for messages, event in zip(queues, ready)
+    ]
+    for process in processes:
+        process.start()
+    for event in ready:
+        event.wait()
+    begin = time.time()
+    for i in range(MESSAGES):
+        msg = TOPICS[i % 4]
+        for messages in queues:
+            messages.put(msg)
+    for messages in queues:
+        messages.put(None)
+    counts = [done.get() for _ in processes]
+    elapsed = time.time() - begin
+    for process in processes:
+        process.join()
+    assert counts == [MESSAGES] * workers
+    return elapsed
+
+
+def main():
+    print("{:>8} {:>10} {:>18} {:>18}".format("workers", "messages", "shared msg/s", "queue msg/s"))
+    for workers in (1, 2, 4, 8):
+        print(
+            "{:>8} {:>10} {:>18.0f} {:>18.0f}".format(
+                workers, MESSAGES, MESSAGES / bench_shm(workers), MESSAGES / bench_queue(workers)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
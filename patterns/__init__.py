@@ -0,0 +1,42 @@
+"""
+The pattern subpackages import their modules on first use (PEP 562): for
+example `patterns.behavioral.Provider` imports only
+patterns/behavioral/publish_subscribe.py. Module __getattr__ needs Python
+3.7; on Python 2 and 3.6 the attributes are not available and the modules
+have to be imported explicitly.
+"""
+
+import importlib
+import sys
+
+
+def lazy_exports(package, namespace, exports, submodules):
+    """Return module level __getattr__ and __dir__ functions for `package`.
+
+    `exports` maps attribute names to the submodule defining them and
+    `submodules` lists the modules reachable as attributes. A resolved
+    attribute is stored on the package, so __getattr__ runs once per name.
+    """
+
+    def __getattr__(name):
+        if name in exports:
+            value = getattr(importlib.import_module('.' + exports[name], package), name)
+        elif name in submodules:
+            value = importlib.import_module('.' + name, package)
+        else:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(package, name))
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(exports) | set(submodules))
+
+    return __getattr__, __dir__
+
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    globals(),
+    {},
+    ['behavioral', 'creational', 'dependency_injection', 'fundamental', 'other', 'structural'],
+)
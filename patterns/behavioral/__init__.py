@@ -0,0 +1,50 @@
+from patterns import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    globals(),
+    {
+        'Catalog': 'catalog',
+        'Handler': 'chain_of_responsibility__py3',
+        'MoveFileCommand': 'command',
+        'ChatRoom': 'mediator',
+        'Transaction': 'memento',
+        'Transactional': 'memento',
+        'Subject': 'observer',
+        'Provider': 'publish_subscribe',
+        'Publisher': 'publish_subscribe',
+        'Subscriber': 'publish_subscribe',
+        'MessageLog': 'publish_subscribe',
+        'ThreadedProvider': 'publish_subscribe',
+        'TopicTrie': 'publish_subscribe',
+        'AsyncProvider': 'publish_subscribe_asyncio__py3',
+        'SharedMemoryProvider': 'publish_subscribe_shm',
+        'SharedMemoryReader': 'publish_subscribe_shm',
+        'RegistryHolder': 'registry__py3',
+        'Specification': 'specification',
+        'CompositeSpecification': 'specification',
+        'State': 'state',
+        'Radio': 'state',
+        'Order': 'strategy',
+        'Visitor': 'visitor',
+    },
+    [
+        'catalog',
+        'chain_of_responsibility__py3',
+        'chaining_method',
+        'command',
+        'iterator',
+        'mediator',
+        'memento',
+        'observer',
+        'publish_subscribe',
+        'publish_subscribe_asyncio__py3',
+        'publish_subscribe_shm',
+        'registry__py3',
+        'specification',
+        'state',
+        'strategy',
+        'template',
+        'visitor',
+    ],
+)
@@ -4,28 +4,608 @@
 Reference:
 http://www.slideshare.net/ishraqabd/publish-subscribe-model-overview-13368808
 Author: https://github.com/HanWenfang
+
+Messages are dot-separated topics such as "orders.eu.created". A
+subscription may use wildcards: "*" matches exactly one level and "#" any
+number of levels, so "orders.*.created" and "orders.#" both match the
+topic above.
+
+A subscriber that defines run_batch(msgs) is not called once per message:
+update() collects the messages it would have received and hands them over
+in one run_batch call after the per-message deliveries.
+
+Provider(capacity=n) keeps queued messages in a MessageRing of n slots
+instead of a growing list. When it is full, notify() raises QueueFull,
+drops the oldest or the newest message, or waits for update() to make
+room, depending on `overflow`; dropped messages are counted. The default
+is 'raise': 'block' only makes sense when update() runs in another thread,
+since a single thread would wait for itself forever.
+
+ThreadedProvider runs the subscribers on a thread pool, for subscribers
+that block on I/O: each subscriber gets its messages in order, one at a
+time, but different subscribers run in parallel.
+
+Provider(log=MessageLog(directory)) also appends every notified message to
+a log on disk, kept as memory-mapped segment files. update() records how
+far each subscriber has got, and after a restart replay(subscriber) hands
+it the logged messages it has not seen yet. A message a bounded queue
+rejects or drops is not logged; 'drop_oldest' would drop a message that is
+logged already, so it cannot be used with a log. A Provider without a log
+does no extra work in notify().
 """
 
+import collections
+import functools
+import itertools
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_right
+
+try:
+    import queue
+except ImportError:  # python 2.x compatibility
+    import Queue as queue
+
+_now = getattr(time, 'monotonic', time.time)
+_replace = getattr(os, 'replace', os.rename)
+
+
+class TopicTrie:
+    """Subscriptions stored by topic level, so matching a topic walks at
+    most one branch per level (plus the wildcard branches) instead of
+    testing every subscription."""
 
-class Provider:
     def __init__(self):
-        self.msg_queue = []
+        self._root = _TrieNode()
+        self._order = itertools.count()
+
+    def add(self, pattern, subscriber):
+        node = self._root
+        for level in pattern.split('.'):
+            node = node.children.setdefault(level, _TrieNode())
+        node.entries.append((next(self._order), subscriber))
+
+    def remove(self, pattern, subscriber):
+        path = [self._root]
+        for level in pattern.split('.'):
+            path.append(path[-1].children.get(level))
+            if path[-1] is None:
+                raise ValueError('{!r} is not subscribed to {!r}'.format(subscriber, pattern))
+        entries = path[-1].entries
+        for i, (_, sub) in enumerate(entries):
+            if sub == subscriber:
+                del entries[i]
+                break
+        else:
+            raise ValueError('{!r} is not subscribed to {!r}'.format(subscriber, pattern))
+        for level, parent, node in reversed(list(zip(pattern.split('.'), path, path[1:]))):
+            if node.children or node.entries:
+                break
+            del parent.children[level]
+
+    def match(self, topic):
+        """Subscribers of every pattern matching `topic`, in subscription order."""
+        found = {}
+        self._collect(self._root, topic.split('.'), 0, found)
+        return [found[order] for order in sorted(found)]
+
+    def _collect(self, node, levels, i, found):
+        if i == len(levels):
+            found.update(node.entries)
+        else:
+            for key in (levels[i], '*'):
+                child = node.children.get(key)
+                if child is not None:
+                    self._collect(child, levels, i + 1, found)
+        rest = node.children.get('#')
+        if rest is not None:
+            for j in range(i, len(levels) + 1):
+                self._collect(rest, levels, j, found)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = []
+
+
+class QueueFull(queue.Full):
+    pass
+
+
+class MessageRing:
+    """A fixed number of message slots used as a FIFO queue. `lock` guards
+    the ring; pass a threading.RLock to hold it across several calls."""
+
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest', 'raise')
+
+    def __init__(self, capacity, overflow='block', timeout=None, lock=None):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of {}'.format(', '.join(self.OVERFLOW_POLICIES)))
+        self.capacity = capacity
+        self.overflow = overflow
+        self.timeout = timeout
+        self.dropped = 0
+        self._slots = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._not_full = threading.Condition(lock or threading.Lock())
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('message index out of range')
+        return self._slots[(self._head + index) % self.capacity]
+
+    def __iter__(self):
+        with self._not_full:
+            return iter([self[i] for i in range(self._size)])
+
+    def append(self, msg):
+        with self._not_full:
+            if self._reserve():
+                self._slots[(self._head + self._size) % self.capacity] = msg
+                self._size += 1
+
+    def reserve(self):
+        """Make room for one more message under the overflow policy, as
+        append() would; False means the message is dropped. Holding the
+        ring's lock across reserve() and append() keeps the room."""
+        with self._not_full:
+            return self._reserve()
+
+    def drain(self):
+        """Remove and return every queued message, oldest first."""
+        with self._not_full:
+            msgs = [self[i] for i in range(self._size)]
+            self._slots = [None] * self.capacity
+            self._head = self._size = 0
+            self._not_full.notify_all()
+        return msgs
+
+    def _reserve(self):
+        if self._size == self.capacity and not self._make_room():
+            self.dropped += 1
+            return False
+        return True
+
+    def _make_room(self):
+        """Apply the overflow policy to a full ring; False means the new
+        message is dropped."""
+        if self.overflow == 'drop_newest':
+            return False
+        if self.overflow == 'drop_oldest':
+            self._slots[self._head] = None
+            self._head = (self._head + 1) % self.capacity
+            self._size -= 1
+            self.dropped += 1
+            return True
+        if self.overflow == 'raise':
+            raise QueueFull('message queue is full ({} messages)'.format(self.capacity))
+        deadline = None if self.timeout is None else _now() + self.timeout
+        while self._size == self.capacity:
+            remaining = None if deadline is None else deadline - _now()
+            if remaining is not None and remaining <= 0:
+                raise QueueFull('message queue still full after {} seconds'.format(self.timeout))
+            self._not_full.wait(remaining)
+        return True
+
+
+class MessageLog:
+    """Messages appended to segment files in `directory`, each numbered by
+    its offset in the log.
+
+    A segment is a file of `segment_size` bytes, named after the offset of
+    its first message and mapped into memory while it is written. Each
+    record is its length plus one, as four bytes, followed by the UTF-8
+    text; the zero bytes the file starts with mark the end. The text is
+    written before the length, so a record cut short by a crash reads as
+    the end of the log.
+
+    `fsync` says when written pages are flushed to disk: after every
+    message ('always'), at most every `fsync_interval` seconds
+    ('interval') or only when a segment is finished or the log is closed
+    ('never'). The positions reached by subscribers are kept in
+    offsets.json next to the segments, rewritten on every commit() and
+    flushed to disk under the same policy.
+    """
+
+    FSYNC_POLICIES = ('always', 'interval', 'never')
+    RECORD = struct.Struct('<I')
+
+    def __init__(self, directory, segment_size=16 << 20, fsync='interval', fsync_interval=1.0):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError('fsync must be one of {}'.format(', '.join(self.FSYNC_POLICIES)))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._bases = sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith('.log'))
+        self._offsets_path = os.path.join(directory, 'offsets.json')
+        try:
+            with open(self._offsets_path) as f:
+                self._offsets = json.load(f)
+        except (IOError, OSError):
+            self._offsets = {}
+        self._file = self._map = None
+        self._offsets_synced = _now()
+        self._offsets_unsynced = False
+        self._lock = threading.Lock()
+        self._open_segment(self._bases[-1] if self._bases else 0)
+
+    @property
+    def end(self):
+        """The offset the next message will get."""
+        return self._end
+
+    def append(self, msg):
+        payload = msg.encode('utf-8')
+        size = self.RECORD.size + len(payload)
+        if size > self.segment_size:
+            raise ValueError('message of {} bytes does not fit in a segment'.format(len(payload)))
+        with self._lock:
+            if self._position + size > len(self._map):
+                self._open_segment(self._end)
+            position = self._position
+            self._map[position + self.RECORD.size:position + size] = payload
+            self.RECORD.pack_into(self._map, position, len(payload) + 1)
+            self._position += size
+            self._end += 1
+            if self.fsync == 'always' or (self.fsync == 'interval' and _now() - self._synced >= self.fsync_interval):
+                self.flush()
+            return self._end - 1
+
+    def read(self, start=0, stop=None):
+        """Yield (offset, message) for the logged messages from `start` up
+        to, but not including, `stop` (by default the current end)."""
+        with self._lock:
+            stop = self._end if stop is None else min(stop, self._end)
+            bases = list(self._bases)
+        for i in range(max(bisect_right(bases, start) - 1, 0), len(bases)):
+            if bases[i] >= stop:
+                return
+            with open(self._segment_path(bases[i]), 'rb') as f:
+                segment = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for offset, begin, finish in self._records(segment, bases[i]):
+                    if offset >= stop:
+                        return
+                    if offset >= start:
+                        yield offset, segment[begin:finish].decode('utf-8')
+            finally:
+                segment.close()
+
+    def commit(self, offsets):
+        """Record the offsets subscribers have reached, e.g. {'jim': 42}."""
+        with self._lock:
+            self._offsets.update(offsets)
+            now = _now()
+            due = self.fsync == 'interval' and now - self._offsets_synced >= self.fsync_interval
+            self._write_offsets(self.fsync == 'always' or due)
+            if due:
+                self._offsets_synced = now
+
+    def _write_offsets(self, sync):
+        path = self._offsets_path + '.tmp'
+        with open(path, 'w') as f:
+            json.dump(self._offsets, f)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        self._offsets_unsynced = not sync
+        _replace(path, self._offsets_path)
+
+    def committed(self, name, default=0):
+        return self._offsets.get(name, default)
+
+    def flush(self):
+        self._map.flush()
+        self._synced = _now()
+
+    def close(self):
+        if self._offsets_unsynced and self.fsync != 'never':
+            self._write_offsets(True)
+        if self._map is not None:
+            self.flush()
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _segment_path(self, base):
+        return os.path.join(self.directory, '{:020d}.log'.format(base))
+
+    def _open_segment(self, base):
+        self.close()
+        path = self._segment_path(base)
+        if base not in self._bases:
+            with open(path, 'wb') as f:
+                f.truncate(self.segment_size)
+            self._bases.append(base)
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._end, self._position = base, 0
+        for offset, _, finish in self._records(self._map, base):
+            self._end, self._position = offset + 1, finish
+        self._synced = _now()
+
+    def _records(self, segment, base):
+        """Yield (offset, start, stop) for the text of each record."""
+        position, offset = 0, base
+        while position + self.RECORD.size <= len(segment):
+            length = self.RECORD.unpack_from(segment, position)[0]
+            if not length:
+                return
+            start = position + self.RECORD.size
+            position = start + length - 1
+            yield offset, start, position
+            offset += 1
+
+
+class Provider:
+    route_cache_size = 4096
+
+    def __init__(self, capacity=None, overflow='raise', timeout=None, log=None):
+        self.capacity = capacity
+        # with a log, notify() and update() hold this across the log and the
+        # queue, so the queue always holds the newest logged messages; the
+        # ring shares it, which is why it is reentrant, and a blocked
+        # notify() releases it while it waits
+        self._lock = threading.RLock()
+        if capacity is None:
+            self.msg_queue = []
+        else:
+            self.msg_queue = MessageRing(capacity, overflow, timeout, self._lock if log is not None else None)
         self.subscribers = {}
+        self._topics = TopicTrie()
+        self._routes = {}
+        self.log = log
+        if log is not None:
+            if overflow == 'drop_oldest' and capacity is not None:
+                # the dropped message is already logged, and the next commit
+                # would record it as delivered
+                raise ValueError("a Provider with a log cannot use overflow='drop_oldest'")
+            # bound per instance, so notify() stays a plain append without a log
+            self.notify = self._notify_logged
+
+    @property
+    def dropped(self):
+        """Messages lost to the overflow policy of a bounded queue."""
+        return 0 if self.capacity is None else self.msg_queue.dropped
 
     def notify(self, msg):
         self.msg_queue.append(msg)
 
+    def _notify_logged(self, msg):
+        with self._lock:
+            # only a message the queue accepts is logged, or update() would
+            # commit it as delivered
+            if self.capacity is None or self.msg_queue.reserve():
+                self.log.append(msg)
+                self.msg_queue.append(msg)
+
+    def replay(self, subscriber, start=None):
+        """Hand `subscriber` the logged messages it is subscribed to, from
+        offset `start` or else from where it got to last time, and return
+        how many it got."""
+        if start is None:
+            start = self.log.committed(subscriber.name)
+        end = self.log.end
+        msgs = [msg for _, msg in self.log.read(start, end) if subscriber in self.subscribers_for(msg)]
+        if hasattr(subscriber, 'run_batch'):
+            if msgs:
+                subscriber.run_batch(msgs)
+        else:
+            for msg in msgs:
+                subscriber.run(msg)
+        self.log.commit({subscriber.name: end})
+        return len(msgs)
+
     def subscribe(self, msg, subscriber):
         self.subscribers.setdefault(msg, []).append(subscriber)
+        self._topics.add(msg, subscriber)
+        self._routes.clear()
 
     def unsubscribe(self, msg, subscriber):
         self.subscribers[msg].remove(subscriber)
+        self._topics.remove(msg, subscriber)
+        self._routes.clear()
+
+    def subscribers_for(self, msg):
+        """Subscribers whose subscription matches `msg`. Results are cached
+        per topic until the subscriptions change."""
+        try:
+            return self._routes[msg]
+        except KeyError:
+            if len(self._routes) >= self.route_cache_size:
+                self._routes.clear()
+            subscribers = self._routes[msg] = tuple(self._topics.match(msg))
+            return subscribers
 
     def update(self):
-        for msg in self.msg_queue:
-            for sub in self.subscribers.get(msg, []):
-                sub.run(msg)
-        self.msg_queue = []
+        with self._lock:
+            # the end and the queue are read together: a message logged after
+            # this point is not in this update and must not be committed
+            end = None if self.log is None else self.log.end
+            if self.capacity is None:
+                # swap before dispatching: notify() from a subscriber or another
+                # thread goes to the new list and is delivered by the next update
+                msgs, self.msg_queue = self.msg_queue, []
+            else:
+                msgs = self.msg_queue.drain()
+        plans = {}
+        groups = collections.OrderedDict()
+        for i, msg in enumerate(msgs):
+            try:
+                runs, batched = plans[msg]
+            except KeyError:
+                runs, batched = plans[msg] = self._plan(msg)
+            for run in runs:
+                run(msg)
+            if batched:
+                groups.setdefault(batched, []).append(i)
+        if groups:
+            self._run_batches(msgs, groups)
+        if end is not None:
+            self._commit_offsets(end)
+
+    def _commit_offsets(self, end):
+        names = set()
+        for subs in self.subscribers.values():
+            names.update(sub.name for sub in subs if hasattr(sub, 'name'))
+        if names:
+            self.log.commit(dict.fromkeys(names, end))
+
+    def _run_batches(self, msgs, groups):
+        # groups maps each distinct tuple of batch subscribers to the queue
+        # positions they receive, so the loop above appends once per message
+        # however many batch subscribers there are
+        positions = collections.OrderedDict()
+        for batched, indices in groups.items():
+            for sub in batched:
+                positions.setdefault(sub, []).append(indices)
+        for sub, lists in positions.items():
+            indices = lists[0] if len(lists) == 1 else sorted(itertools.chain.from_iterable(lists))
+            self._handler(sub, sub.run_batch)([msgs[i] for i in indices])
+
+    def _plan(self, msg):
+        runs, batched = [], []
+        for sub in self.subscribers_for(msg):
+            if hasattr(sub, 'run_batch'):
+                batched.append(sub)
+            else:
+                runs.append(self._handler(sub, sub.run))
+        return runs, tuple(batched)
+
+    def _handler(self, subscriber, method):
+        """The callable update() uses to hand `subscriber` its messages."""
+        return method
+
+
+class ThreadedProvider(Provider):
+    """A Provider whose update() only schedules deliveries on a thread
+    pool. Each subscriber still receives its messages one at a time and in
+    order, while different subscribers run in parallel. drain() waits for
+    the scheduled deliveries and re-raises the first exception a
+    subscriber raised."""
+
+    # deliveries run for one subscriber before its worker goes to the back
+    # of the executor queue, so a busy subscriber cannot starve the others
+    slice_size = 64
+
+    def __init__(self, max_workers=None, **kwargs):
+        from concurrent.futures import ThreadPoolExecutor
+
+        Provider.__init__(self, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers or 4)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._mailboxes = {}
+        self._pending = 0
+        self._errors = []
+        self._delivered_end = None
+
+    def drain(self, timeout=None):
+        """Wait until every scheduled delivery has run. Returns False if
+        some are still pending after `timeout` seconds."""
+        deadline = None if timeout is None else _now() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = None if deadline is None else deadline - _now()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+            errors, self._errors = self._errors, []
+            end, self._delivered_end = self._delivered_end, None
+        if errors:
+            raise errors[0]
+        if end is not None:
+            Provider._commit_offsets(self, end)
+        return True
+
+    def close(self):
+        """Deliver what is queued, wait for it and shut the pool down."""
+        self.update()
+        try:
+            self.drain()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _handler(self, subscriber, method):
+        return functools.partial(self._submit, subscriber, method)
+
+    def _commit_offsets(self, end):
+        # the deliveries are still running; drain() commits once they are done
+        self._delivered_end = end
+
+    def _submit(self, subscriber, method, arg):
+        with self._lock:
+            self._pending += 1
+            mailbox = self._mailboxes.get(subscriber)
+            if mailbox is not None:
+                # a worker owns this subscriber and will get to it in order
+                mailbox.append((method, arg))
+                return
+            self._mailboxes[subscriber] = collections.deque([(method, arg)])
+        try:
+            self._executor.submit(self._run_mailbox, subscriber)
+        except RuntimeError:
+            # the pool has been shut down; nothing will run this delivery
+            with self._idle:
+                self._pending -= 1
+                del self._mailboxes[subscriber]
+                if not self._pending:
+                    self._idle.notify_all()
+            raise
+
+    def _run_mailbox(self, subscriber):
+        mailbox = self._mailboxes[subscriber]
+        for _ in range(self.slice_size):
+            with self._lock:
+                if not mailbox:
+                    del self._mailboxes[subscriber]
+                    return
+                method, arg = mailbox.popleft()
+            try:
+                method(arg)
+            except Exception as exc:
+                with self._lock:
+                    self._errors.append(exc)
+            finally:
+                with self._idle:
+                    self._pending -= 1
+                    if not self._pending:
+                        self._idle.notify_all()
+        with self._lock:
+            if not mailbox:
+                del self._mailboxes[subscriber]
+                return
+        self._executor.submit(self._run_mailbox, subscriber)
 
 
 class Publisher:
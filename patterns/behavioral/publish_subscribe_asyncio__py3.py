@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+The publish_subscribe Provider for asyncio.
+
+Provider.update() calls every subscriber in turn, so one slow subscriber
+holds up delivery to all the others. Here publishing only puts the message
+on a queue; update() is a dispatcher that runs until close() and copies
+each message into a bounded mailbox per subscriber, and every subscriber
+has its own consumer task reading its mailbox. A subscriber's run() may be
+a plain function or a coroutine. Subscriptions work as on Provider.
+
+The dispatcher never waits for a mailbox, so a subscriber that falls behind
+cannot hold up the others. When its mailbox is full the oldest or the
+newest message is dropped, depending on `overflow`; dropped messages are
+counted.
+"""
+
+import asyncio
+import inspect
+
+from patterns.behavioral.publish_subscribe import Provider
+
+_STOP = object()
+
+
+class AsyncProvider(Provider):
+    OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest')
+
+    def __init__(self, mailbox_size=100, overflow='drop_oldest'):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of {}'.format(', '.join(self.OVERFLOW_POLICIES)))
+        super().__init__()
+        self.mailbox_size = mailbox_size
+        self.overflow = overflow
+        self._incoming = None  # created on first use, inside the running loop
+        self._mailboxes = {}  # subscriber -> (queue, consumer task)
+        self._dropped = 0
+        self._closed = False
+
+    @property
+    def msg_queue(self):
+        if self._incoming is None:
+            self._incoming = asyncio.Queue()
+        return self._incoming
+
+    @msg_queue.setter
+    def msg_queue(self, queue):
+        self._incoming = queue
+
+    @property
+    def dropped(self):
+        """Messages lost because a subscriber's mailbox was full."""
+        return self._dropped
+
+    def notify(self, msg):
+        if self._closed:
+            raise RuntimeError('provider is closed')
+        self.msg_queue.put_nowait(msg)
+
+    async def update(self):
+        """Dispatch published messages until close() is called."""
+        while True:
+            msg = await self.msg_queue.get()
+            try:
+                if msg is _STOP:
+                    return
+                for sub in self.subscribers_for(msg):
+                    self._deliver(sub, msg)
+            finally:
+                self.msg_queue.task_done()
+
+    async def drain(self):
+        """Wait until every message published so far has been handled."""
+        await self.msg_queue.join()
+        for mailbox, _ in list(self._mailboxes.values()):
+            await mailbox.join()
+
+    async def close(self):
+        """Deliver what is already queued, then stop the dispatcher and the
+        consumer tasks."""
+        if not self._closed:
+            self._closed = True
+            self.msg_queue.put_nowait(_STOP)
+        await self.drain()
+        consumers = [task for _, task in self._mailboxes.values()]
+        for task in consumers:
+            task.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        self._mailboxes.clear()
+
+    def _deliver(self, subscriber, msg):
+        mailbox = self._mailbox(subscriber)
+        if mailbox.full():
+            self._dropped += 1
+            if self.overflow == 'drop_newest':
+                return
+            mailbox.get_nowait()
+            mailbox.task_done()
+        mailbox.put_nowait(msg)
+
+    def _mailbox(self, subscriber):
+        try:
+            return self._mailboxes[subscriber][0]
+        except KeyError:
+            mailbox = asyncio.Queue(self.mailbox_size)
+            task = asyncio.ensure_future(self._consume(subscriber, mailbox))
+            self._mailboxes[subscriber] = (mailbox, task)
+            return mailbox
+
+    @staticmethod
+    async def _consume(subscriber, mailbox):
+        while True:
+            msg = await mailbox.get()
+            try:
+                result = subscriber.run(msg)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as exc:
+                asyncio.get_event_loop().call_exception_handler(
+                    {'message': '{!r} failed to handle {!r}'.format(subscriber, msg), 'exception': exc}
+                )
+            finally:
+                mailbox.task_done()
+
+
+class Publisher:
+    def __init__(self, msg_center):
+        self.provider = msg_center
+
+    def publish(self, msg):
+        self.provider.notify(msg)
+
+
+class Subscriber:
+    def __init__(self, name, msg_center, delay=0):
+        self.name = name
+        self.provider = msg_center
+        self.delay = delay
+
+    def subscribe(self, msg):
+        self.provider.subscribe(msg, self)
+
+    def unsubscribe(self, msg):
+        self.provider.unsubscribe(msg, self)
+
+    async def run(self, msg):
+        await asyncio.sleep(self.delay)
+        print("{} got {}".format(self.name, msg))
+
+
+def main():
+    async def run():
+        message_center = AsyncProvider()
+        dispatcher = asyncio.ensure_future(message_center.update())
+
+        fftv = Publisher(message_center)
+        jim = Subscriber("jim", message_center, delay=0.05)
+        jim.subscribe("cartoon")
+        jack = Subscriber("jack", message_center)
+        jack.subscribe("music")
+        jack.subscribe("cartoon")
+
+        fftv.publish("cartoon")
+        fftv.publish("music")
+        fftv.publish("ads")
+
+        await message_center.close()
+        await dispatcher
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jack got cartoon
+jack got music
+jim got cartoon
+"""
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Publish/subscribe across processes on one host.
+
+SharedMemoryProvider writes every published message once into a ring
+buffer in a multiprocessing.shared_memory block. Each worker process opens
+the block with a SharedMemoryReader, subscribes its own Subscribers as it
+would on a Provider, and calls update() to deliver what was published since
+its last call. Messages are copied as UTF-8 bytes; nothing is pickled and
+no pipe is involved, however many readers there are.
+
+There is one writer. Every reader has a slot in the block holding how far
+it has read, and the writer waits rather than overwrite anything a reader
+has not read yet, so a reader that stops reading must close() its slot.
+
+The writer stores a record before it advances the shared write position,
+and readers never read past that position. Python has no memory barriers,
+so on hardware that may reorder stores (ARM, POWER) a reader could see the
+new position before the record. Every record therefore carries a CRC-32 of
+its payload seeded with its position; a reader that finds a record whose
+checksum does not match yet stops there and reads it on its next call.
+
+Needs Python 3.8 or later.
+"""
+
+import collections
+import struct
+import time
+import zlib
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+from patterns.behavioral.publish_subscribe import Provider, QueueFull
+
+_now = getattr(time, 'monotonic', time.time)
+
+# header: write position, capacity, number of reader slots, closed flag
+HEADER = struct.Struct('<QQQQ')
+# reader slot: read position, active flag
+SLOT = struct.Struct('<QQ')
+# record header: payload length, checksum
+RECORD = struct.Struct('<II')
+POSITION = struct.Struct('<Q')
+CLOSED_OFFSET = 24
+
+ReaderHandle = collections.namedtuple('ReaderHandle', 'name slot')
+
+
+def _checksum(position, payload):
+    # seeding with the position tells a record from stale bytes left at the
+    # same place in the ring by an earlier lap
+    return zlib.crc32(payload, position & 0xFFFFFFFF) & 0xFFFFFFFF
+
+
+def _require_shared_memory():
+    if shared_memory is None:
+        raise RuntimeError('multiprocessing.shared_memory needs Python 3.8 or later')
+
+
+class _Ring:
+    """The layout of the shared block, shared by writer and readers."""
+
+    def __init__(self, shm):
+        self.shm = shm
+        self.buf = shm.buf
+        _, self.capacity, self.slots, _ = HEADER.unpack_from(self.buf, 0)
+        self.data_offset = HEADER.size + SLOT.size * self.slots
+
+    def write_position(self):
+        return POSITION.unpack_from(self.buf, 0)[0]
+
+    def slot_offset(self, slot):
+        return HEADER.size + SLOT.size * slot
+
+    def copy_in(self, position, data):
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        begin = self.data_offset + start
+        self.buf[begin:begin + first] = data[:first]
+        if first < len(data):
+            self.buf[self.data_offset:self.data_offset + len(data) - first] = data[first:]
+
+    def copy_out(self, position, size):
+        start = position % self.capacity
+        first = min(size, self.capacity - start)
+        begin = self.data_offset + start
+        data = bytes(self.buf[begin:begin + first])
+        if first < size:
+            data += bytes(self.buf[self.data_offset:self.data_offset + size - first])
+        return data
+
+    def release(self):
+        self.buf = None
+        self.shm.close()
+
+
+class SharedMemoryProvider:
+    """The publishing side. `capacity` is the size of the ring in bytes;
+    notify() waits up to `timeout` seconds for slow readers before raising
+    QueueFull."""
+
+    def __init__(self, capacity=1 << 20, max_readers=16, timeout=None):
+        _require_shared_memory()
+        size = HEADER.size + SLOT.size * max_readers + capacity
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        HEADER.pack_into(self._shm.buf, 0, 0, capacity, max_readers, 0)
+        for slot in range(max_readers):
+            SLOT.pack_into(self._shm.buf, HEADER.size + SLOT.size * slot, 0, 0)
+        self._ring = _Ring(self._shm)
+        self.name = self._shm.name
+        self.timeout = timeout
+        self._position = 0
+        # the lowest read position seen last time the slots were scanned;
+        # readers only move forward, so until the ring looks full there is
+        # no need to look again
+        self._low = 0
+
+    def add_reader(self):
+        """Reserve a reader slot starting at the current write position.
+        Pass the handle to the process that opens SharedMemoryReader."""
+        ring = self._ring
+        for slot in range(ring.slots):
+            offset = ring.slot_offset(slot)
+            if not SLOT.unpack_from(ring.buf, offset)[1]:
+                SLOT.pack_into(ring.buf, offset, self._position, 1)
+                return ReaderHandle(self.name, slot)
+        raise ValueError('all {} reader slots are taken'.format(ring.slots))
+
+    def notify(self, msg):
+        payload = msg.encode('utf-8')
+        record = RECORD.pack(len(payload), _checksum(self._position, payload)) + payload
+        if len(record) > self._ring.capacity:
+            raise ValueError('message of {} bytes does not fit in the ring'.format(len(payload)))
+        if self._position + len(record) - self._low > self._ring.capacity:
+            self._wait_for_readers(len(record))
+        self._ring.copy_in(self._position, record)
+        self._position += len(record)
+        POSITION.pack_into(self._ring.buf, 0, self._position)
+
+    def close(self):
+        """Tell the readers nothing more will be published and drop the
+        writer's mapping of the block."""
+        if self._ring is not None:
+            POSITION.pack_into(self._ring.buf, CLOSED_OFFSET, 1)
+            self._ring.release()
+            self._ring = None
+
+    def unlink(self):
+        """Remove the block once every reader has opened it."""
+        self.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink()
+
+    def _lowest_read_position(self):
+        ring = self._ring
+        low = self._position
+        for slot in range(ring.slots):
+            position, active = SLOT.unpack_from(ring.buf, ring.slot_offset(slot))
+            if active and position < low:
+                low = position
+        return low
+
+    def _wait_for_readers(self, size):
+        deadline = None if self.timeout is None else _now() + self.timeout
+        delay = 0.0001
+        while True:
+            self._low = self._lowest_read_position()
+            if self._position + size - self._low <= self._ring.capacity:
+                return
+            if deadline is not None and _now() >= deadline:
+                raise QueueFull('readers still behind after {} seconds'.format(self.timeout))
+            time.sleep(delay)
+            delay = min(delay * 2, 0.01)
+
+
+class SharedMemoryReader:
+    """The subscribing side, opened in a worker process from the handle
+    returned by SharedMemoryProvider.add_reader()."""
+
+    def __init__(self, handle):
+        _require_shared_memory()
+        self._ring = _Ring(shared_memory.SharedMemory(name=handle.name))
+        self._offset = self._ring.slot_offset(handle.slot)
+        self._position = SLOT.unpack_from(self._ring.buf, self._offset)[0]
+        self._provider = Provider()
+
+    @property
+    def closed(self):
+        """True once the writer has closed; read() may still return the
+        messages published before that."""
+        return bool(POSITION.unpack_from(self._ring.buf, CLOSED_OFFSET)[0])
+
+    def subscribe(self, msg, subscriber):
+        self._provider.subscribe(msg, subscriber)
+
+    def unsubscribe(self, msg, subscriber):
+        self._provider.unsubscribe(msg, subscriber)
+
+    def read(self):
+        """Every message published since the last call, oldest first."""
+        ring = self._ring
+        end = ring.write_position()
+        position = self._position
+        msgs = []
+        while position < end:
+            size, checksum = RECORD.unpack(ring.copy_out(position, RECORD.size))
+            if position + RECORD.size + size > end:
+                break  # the header is not visible yet
+            payload = ring.copy_out(position + RECORD.size, size)
+            if _checksum(position, payload) != checksum:
+                break  # nor is all of the payload; try again next time
+            msgs.append(payload.decode('utf-8'))
+            position += RECORD.size + size
+        self._position = position
+        POSITION.pack_into(ring.buf, self._offset, position)
+        return msgs
+
+    def update(self):
+        """Deliver new messages to the local subscribers; returns how many
+        messages were read."""
+        msgs = self.read()
+        provider = self._provider
+        provider.msg_queue.extend(msgs)
+        provider.update()
+        return len(msgs)
+
+    def close(self):
+        """Give up the reader slot so the writer no longer waits for it."""
+        if self._ring is not None:
+            SLOT.pack_into(self._ring.buf, self._offset, self._position, 0)
+            self._ring.release()
+            self._ring = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Subscriber:
+    def __init__(self, name, reader):
+        self.name = name
+        self.reader = reader
+
+    def subscribe(self, msg):
+        self.reader.subscribe(msg, self)
+
+    def run(self, msg):
+        print("{} got {}".format(self.name, msg))
+
+
+def worker(handle, name, topic):
+    with SharedMemoryReader(handle) as reader:
+        Subscriber(name, reader).subscribe(topic)
+        while not reader.closed:
+            if not reader.update():
+                time.sleep(0.001)
+        reader.update()
+
+
+def main():
+    import multiprocessing
+
+    with SharedMemoryProvider(capacity=4096) as provider:
+        readers = [(provider.add_reader(), "jim", "cartoon"), (provider.add_reader(), "jack", "tv.#")]
+        for msg in ["cartoon", "tv.music", "ads", "tv.movie"]:
+            provider.notify(msg)
+        provider.close()
+
+        # one after the other, to keep the output in order
+        for args in readers:
+            process = multiprocessing.Process(target=worker, args=args)
+            process.start()
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
+
+
+OUTPUT = """
+jim got cartoon
+jack got tv.music
+jack got tv.movie
+"""
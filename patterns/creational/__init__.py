@@ -0,0 +1,27 @@
+from patterns import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    globals(),
+    {
+        'PetShop': 'abstract_factory',
+        'Borg': 'borg',
+        'Building': 'builder',
+        'ComplexBuilding': 'builder',
+        'lazy_property': 'lazy_evaluation',
+        'lazy_property2': 'lazy_evaluation',
+        'threadsafe_lazy_property': 'lazy_evaluation',
+        'lazy_slot_property': 'lazy_evaluation',
+        'async_lazy_property': 'lazy_evaluation',
+        'cached_property_ttl': 'lazy_evaluation',
+        'invalidate': 'lazy_evaluation',
+        'ObjectPool': 'pool',
+        'BoundedPool': 'pool',
+        'ShardedPool': 'pool',
+        'PoolTimeout': 'pool',
+        'AsyncObjectPool': 'pool_asyncio__py3',
+        'Prototype': 'prototype',
+        'PrototypeDispatcher': 'prototype',
+    },
+    ['abstract_factory', 'borg', 'builder', 'factory', 'lazy_evaluation', 'pool', 'pool_asyncio__py3', 'prototype'],
+)
@@ -18,12 +18,30 @@ https://github.com/Pylons/pyramid/blob/7909e9503cdfc6f6e84d2c7ace1d3c03ca1d8b73/
 werkzeug
 https://github.com/pallets/werkzeug/blob/5a2bf35441006d832ab1ed5a31963cbc366c99ac/werkzeug/utils.py#L35
 
+cached_property_ttl 的值只保留指定的秒數；invalidate() 可以手動丟棄快取值。
+用 depends_on 宣告延遲屬性依賴哪些屬性，並繼承 InvalidateOnSet，
+設定這些來源屬性時，依賴它們的延遲屬性會自動被丟棄。
+使用 __slots__ 的類別沒有 __dict__，要改用 lazy_slot_property，
+並在 __slots__ 中保留一個存放結果的 slot（見 SlottedPerson）。
+async_lazy_property 用於 coroutine：同時等待的呼叫共用同一個 asyncio Task。
+
 *TL;DR80
 延遲 expr 的 eval 直到需要它的值並避免重複的 eval。
 """
 
 from __future__ import print_function
 import functools
+import threading
+import time
+import weakref
+
+try:
+    import asyncio
+except ImportError:  # python 2.x compatibility
+    asyncio = None
+
+_now = getattr(time, 'monotonic', time.time)
+_not_computed = object()
 
 
 class lazy_property(object):
@@ -39,6 +57,107 @@ class lazy_property(object):
         return val
 
 
+class threadsafe_lazy_property(object):
+    """
+    與 lazy_property 相同，但多個執行緒同時存取時 function 只會執行一次。
+    鎖是每個實例各自的，不同實例可以同時計算。值寫入 __dict__ 之後，
+    屬性查找直接取得該值而不再經過 __get__，因此不會再有任何上鎖的開銷。
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.lock_name = '_lazy_lock__' + function.__name__
+        functools.update_wrapper(self, function)
+
+    def __get__(self, obj, type_):
+        if obj is None:
+            return self
+        name = self.function.__name__
+        # dict.setdefault 是原子操作，同一個實例只會得到同一把鎖
+        lock = obj.__dict__.setdefault(self.lock_name, _InstanceLock())
+        with lock:
+            if name in obj.__dict__:
+                return obj.__dict__[name]
+            val = self.function(obj)
+            obj.__dict__[name] = val
+        # 值已寫入才移除鎖；function 失敗時鎖要留著，正在等待的執行緒與新來的
+        # 執行緒才會用同一把鎖，不會同時重新計算
+        obj.__dict__.pop(self.lock_name, None)
+        return val
+
+
+class _InstanceLock(object):
+    """threadsafe_lazy_property 存在實例上的鎖。function 失敗時它會留在
+    __dict__ 中，所以 pickle 或 copy 實例時換成一把新的鎖。"""
+
+    __slots__ = ('_lock',)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+    def __reduce__(self):
+        return _InstanceLock, ()
+
+
+class lazy_slot_property(object):
+    """
+    給使用 __slots__ 的類別用的 lazy_property：結果存在 __slots__ 中保留的
+    '_lazy__' + 函數名稱 slot 裡。slot 還沒有值就代表還沒計算。
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.slot = '_lazy__' + function.__name__
+        functools.update_wrapper(self, function)
+
+    def __get__(self, obj, type_):
+        if obj is None:
+            return self
+        val = getattr(obj, self.slot, _not_computed)
+        if val is _not_computed:
+            val = self.function(obj)
+            try:
+                setattr(obj, self.slot, val)
+            except AttributeError:
+                raise TypeError('{} needs {!r} in its __slots__'.format(type(obj).__name__, self.slot))
+        return val
+
+
+class async_lazy_property(object):
+    """
+    用於 async 函數。第一次存取時把 coroutine 包成 asyncio Task 並存在
+    '_lazy__' 開頭的屬性中，之後的存取（包含同時等待中的）都等待同一個 Task，
+    await 即得到結果。每次存取拿到的是 asyncio.shield 包過的 future，
+    取消其中一個等待者不會取消共用的 Task。失敗或被取消的 Task 不會被快取，
+    下次存取重新執行。
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.attr = '_lazy__' + function.__name__
+        functools.update_wrapper(self, function)
+
+    def __get__(self, obj, type_):
+        if obj is None:
+            return self
+        task = obj.__dict__.get(self.attr)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = asyncio.ensure_future(self.function(obj))
+            obj.__dict__[self.attr] = task
+            task.add_done_callback(functools.partial(self._forget_failure, obj))
+        return asyncio.shield(task)
+
+    def _forget_failure(self, obj, task):
+        if (task.cancelled() or task.exception() is not None) and obj.__dict__.get(self.attr) is task:
+            del obj.__dict__[self.attr]
+
+
 def lazy_property2(fn):
     attr = '_lazy__' + fn.__name__
 
@@ -51,6 +170,86 @@ def lazy_property2(fn):
     return _lazy_property
 
 
+class cached_property_ttl(object):
+    """
+    快取值在 seconds 秒後過期，下次存取時重新計算。
+    值與過期時間存在 '_lazy__' 開頭的屬性中，所以每次存取都會經過 __get__。
+    """
+
+    def __init__(self, seconds, depends_on=()):
+        self.seconds = seconds
+        self.depends_on = tuple(depends_on)
+
+    def __call__(self, function):
+        self.function = function
+        self.attr = '_lazy__' + function.__name__
+        functools.update_wrapper(self, function)
+        return self
+
+    def __get__(self, obj, type_):
+        if obj is None:
+            return self
+        now = _now()
+        cached = obj.__dict__.get(self.attr)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        val = self.function(obj)
+        obj.__dict__[self.attr] = (val, now + self.seconds)
+        return val
+
+
+def depends_on(*sources):
+    """宣告 lazy_property 或 threadsafe_lazy_property 依賴的屬性，
+    須放在它們的上方。"""
+
+    def decorate(descriptor):
+        descriptor.depends_on = sources
+        return descriptor
+
+    return decorate
+
+
+def invalidate(obj, name):
+    """丟棄 obj 的延遲屬性 name 的快取值，下次存取時重新計算。"""
+    descriptor = getattr(type(obj), name, None)
+    if isinstance(descriptor, lazy_slot_property):
+        try:
+            delattr(obj, descriptor.slot)
+        except AttributeError:
+            pass
+        return
+    if isinstance(descriptor, (lazy_property, threadsafe_lazy_property)):
+        obj.__dict__.pop(name, None)
+    obj.__dict__.pop('_lazy__' + name, None)
+
+
+class InvalidateOnSet(object):
+    """設定屬性時，丟棄以 depends_on 宣告依賴它的延遲屬性（包含間接依賴的）。"""
+
+    _dependents_by_class = weakref.WeakKeyDictionary()
+
+    def __setattr__(self, name, value):
+        super(InvalidateOnSet, self).__setattr__(name, value)
+        dependents = self._dependents()
+        stale = list(dependents.get(name, ()))
+        while stale:
+            derived = stale.pop()
+            invalidate(self, derived)
+            stale.extend(dependents.get(derived, ()))
+
+    @classmethod
+    def _dependents(cls):
+        try:
+            return InvalidateOnSet._dependents_by_class[cls]
+        except KeyError:
+            dependents = {}
+            for name in dir(cls):
+                for source in getattr(getattr(cls, name, None), 'depends_on', ()):
+                    dependents.setdefault(source, []).append(name)
+            InvalidateOnSet._dependents_by_class[cls] = dependents
+            return dependents
+
+
 class Person(object):
     def __init__(self, name, occupation):
         self.name = name
@@ -69,6 +268,19 @@ class Person(object):
         return "Father and mother"
 
 
+class SlottedPerson(object):
+    __slots__ = ('name', 'occupation', '_lazy__relatives')
+
+    def __init__(self, name, occupation):
+        self.name = name
+        self.occupation = occupation
+
+    @lazy_slot_property
+    def relatives(self):
+        relatives = "Many relatives."
+        return relatives
+
+
 def main():
     Jhon = Person('Jhon', 'Coder')
     print(u"Name: {0}    Occupation: {1}".format(Jhon.name, Jhon.occupation))
@@ -16,6 +16,19 @@
 但是因為它之後被釋放回池中，所以通過顯式調用 sample_queue.get() 來重用它。
 同樣的事情發生在 "sam" 中，當 ObjectPool 創建時，該函數被刪除（由 GC）並回傳該物件。
 
+BoundedPool 則自己擁有一個 factory：需要時才創建物件，總數不超過 max_size，
+並保持 min_idle 個預先創建的閒置物件。池滿時 acquire() 最多等待 timeout 秒。
+它提供與 queue.Queue 相同的 get()/put()，所以也能直接交給 ObjectPool 使用。
+每個物件記錄創建與最後歸還的時間：背景 reaper 會移除閒置超過 idle_timeout
+或存活超過 max_lifetime 的物件，借出前可用 validate 檢查物件是否仍可用，
+被移除的物件交給 dispose 清理。
+pool.metrics 記錄借出的等待時間分佈（histogram）、創建、移除與逾時次數；
+pool.snapshot() 再加上使用中與閒置物件數，可依實際數據決定池的大小。
+
+許多執行緒同時借還時，BoundedPool 的鎖會成為瓶頸。ShardedPool 讓每個執行緒
+保留幾個物件在自己的閒置串列中，借還都不需要上鎖；自己的串列空了才向共用的
+BoundedPool 借，共用池也借不到時，再從其他執行緒的串列「偷」一個。
+
 *該模式實際使用在哪裡？
 
 *參考：
@@ -26,6 +39,73 @@ https://sourcemaking.com/design_patterns/object_pool
 存儲一組準備好使用的初始化物件。
 """
 
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import deque
+
+try:
+    import queue
+except ImportError:  # python 2.x compatibility
+    import Queue as queue
+
+_now = getattr(time, 'monotonic', time.time)
+_missing = object()
+
+
+class PoolTimeout(queue.Empty):
+    pass
+
+
+class PoolMetrics(object):
+    # 等待時間 histogram 的上界（秒），最後還有一個無上界的 bucket
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self, buckets=BUCKETS, hook=None):
+        self.buckets = tuple(buckets)
+        self.hook = hook
+        self._wait_counts = [0] * (len(self.buckets) + 1)
+        self.acquired = 0
+        self.timeouts = 0
+        self.created = 0
+        self.destroyed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, event, value=1):
+        """event: 'acquire' 與 'timeout' 的 value 是等待秒數，
+        'create' 與 'destroy' 的 value 是物件數。"""
+        with self._lock:
+            if event in ('acquire', 'timeout'):
+                self._wait_counts[bisect_left(self.buckets, value)] += 1
+                self.wait_total += value
+                self.wait_max = max(self.wait_max, value)
+                if event == 'acquire':
+                    self.acquired += 1
+                else:
+                    self.timeouts += 1
+            elif event == 'create':
+                self.created += value
+            elif event == 'destroy':
+                self.destroyed += value
+        if self.hook is not None:
+            self.hook(event, value)
+
+    def snapshot(self):
+        with self._lock:
+            waits = self.acquired + self.timeouts
+            return {
+                'acquired': self.acquired,
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'destroyed': self.destroyed,
+                'wait_histogram': list(zip(self.buckets + (float('inf'),), self._wait_counts)),
+                'wait_mean': self.wait_total / waits if waits else 0.0,
+                'wait_max': self.wait_max,
+            }
+
 
 class ObjectPool(object):
     def __init__(self, queue, auto_get=False):
@@ -48,12 +128,329 @@ class ObjectPool(object):
             self.item = None
 
 
-def main():
-    try:
-        import queue
-    except ImportError:  # python 2.x compatibility
-        import Queue as queue
+class BoundedPool(object):
+    def __init__(
+        self,
+        factory,
+        max_size,
+        min_idle=0,
+        idle_timeout=None,
+        max_lifetime=None,
+        validate=None,
+        dispose=None,
+        reap_interval=None,
+        metrics_hook=None,
+    ):
+        if not 0 <= min_idle <= max_size:
+            raise ValueError('min_idle must be between 0 and max_size')
+        self._factory = factory
+        self.max_size = max_size
+        self.min_idle = min_idle
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self._validate = validate
+        self._dispose = dispose
+        self._idle = deque()  # [物件, 創建時間, 最後歸還時間]，最舊的在左邊
+        self._born = {}  # 借出中物件的創建時間，以 id() 為鍵
+        self._size = 0  # 已創建的物件數，包含正在創建中的
+        self._cond = threading.Condition()
+        self._closed = threading.Event()
+        self.metrics = PoolMetrics(hook=metrics_hook)
+        self._fill()
+
+        self._reaper = None
+        timeouts = [t for t in (idle_timeout, max_lifetime) if t is not None]
+        if timeouts:
+            # reaper 只持有池的弱參照，沒被 close() 的池仍可被回收，reaper 隨之結束
+            self._reaper = threading.Thread(
+                target=_reap, args=(weakref.ref(self), self._closed, reap_interval or min(timeouts) / 2.0)
+            )
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def acquire(self, timeout=None):
+        return self._acquire(timeout, True)
+
+    def _acquire(self, timeout, record_timeout):
+        began = _now()
+        deadline = None if timeout is None else began + timeout
+        while True:
+            try:
+                entry = self._checkout(deadline, timeout)
+            except PoolTimeout:
+                if record_timeout:
+                    self.metrics.record('timeout', _now() - began)
+                raise
+            if entry is None:
+                # 創建可能很昂貴，在鎖外進行，已先佔好名額
+                item = self._create()
+                break
+            if not self._too_old(entry[1], _now()) and self._is_valid(entry[0]):
+                item = entry[0]
+                with self._cond:
+                    self._born[id(item)] = entry[1]
+                break
+            self._destroy([entry[0]])
+        self.metrics.record('acquire', _now() - began)
+        self._refill()
+        return item
+
+    def release(self, item):
+        now = _now()
+        with self._cond:
+            born = self._born.pop(id(item), now)
+            if not self._too_old(born, now):
+                self._idle.append([item, born, now])
+                self._cond.notify()
+                return
+        self._destroy([item])
+        self._refill()
+
+    def discard(self, item):
+        """丟棄損壞的物件並釋出它的名額。"""
+        with self._cond:
+            self._born.pop(id(item), None)
+        self._destroy([item])
+        self._refill()
+
+    def snapshot(self):
+        """metrics 的快照加上目前的物件數；in_use 包含正在創建中的物件。"""
+        with self._cond:
+            size, idle = self._size, len(self._idle)
+        snapshot = self.metrics.snapshot()
+        snapshot.update(size=size, idle=idle, in_use=size - idle, max_size=self.max_size)
+        return snapshot
+
+    def get(self, block=True, timeout=None):
+        return self.acquire(timeout if block else 0)
+
+    put = release
+
+    def evict(self):
+        """移除超過 max_lifetime 的閒置物件，以及閒置超過 idle_timeout
+        且多於 min_idle 的物件。背景 reaper 會定期呼叫。"""
+        now = _now()
+        with self._cond:
+            keep, expired = deque(), []
+            surplus = len(self._idle) - self.min_idle
+            for entry in self._idle:
+                idle_too_long = self.idle_timeout is not None and now - entry[2] >= self.idle_timeout
+                if self._too_old(entry[1], now) or (idle_too_long and surplus > 0):
+                    expired.append(entry[0])
+                    surplus -= 1
+                else:
+                    keep.append(entry)
+            self._idle = keep
+        if expired:
+            self._destroy(expired)
+            self._fill()
+        return len(expired)
+
+    def close(self):
+        """停止 reaper 並丟棄所有閒置物件。"""
+        self._closed.set()
+        if self._reaper is not None:
+            self._reaper.join()
+        with self._cond:
+            items = [entry[0] for entry in self._idle]
+            self._idle.clear()
+        self._destroy(items)
+
+    def _checkout(self, deadline, timeout):
+        """取出一個閒置項目；若回傳 None，表示已為呼叫者保留一個創建名額。"""
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                remaining = None if deadline is None else deadline - _now()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout('no object available within {} seconds'.format(timeout))
+                self._cond.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+            return None
 
+    def _too_old(self, born, now):
+        return self.max_lifetime is not None and now - born >= self.max_lifetime
+
+    def _is_valid(self, item):
+        if self._validate is None:
+            return True
+        try:
+            return self._validate(item)
+        except Exception:
+            return False
+
+    def _create(self):
+        try:
+            item = self._factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._born[id(item)] = _now()
+        self.metrics.record('create')
+        return item
+
+    def _destroy(self, items):
+        with self._cond:
+            self._size -= len(items)
+            for _ in items:
+                self._cond.notify()
+        if items:
+            self.metrics.record('destroy', len(items))
+        if self._dispose is not None:
+            for item in items:
+                try:
+                    self._dispose(item)
+                except Exception:
+                    pass  # 物件已離開池，清理失敗不影響池的狀態
+
+    def _fill(self):
+        while not self._closed.is_set():
+            with self._cond:
+                if len(self._idle) >= self.min_idle or self._size >= self.max_size:
+                    return
+                self._size += 1
+            self.release(self._create())
+
+    def _refill(self):
+        """借還之後補充 min_idle 只是盡力而為：factory 失敗不能讓已借出或
+        已歸還的物件跟著出錯，下一次借還會再補。"""
+        try:
+            self._fill()
+        except Exception:
+            pass
+
+
+def _reap(pool_ref, closed, interval):
+    while not closed.wait(interval):
+        pool = pool_ref()
+        if pool is None:
+            return
+        try:
+            pool.evict()
+        except Exception:
+            pass  # 例如補充 min_idle 時 factory 失敗；reaper 要繼續運作，下一輪再試
+        del pool  # 等待期間不持有池
+
+
+class ShardedPool(object):
+    def __init__(self, factory, max_size, local_size=4, **kwargs):
+        self.local_size = local_size
+        self.shared = BoundedPool(factory, max_size, **kwargs)
+        # 有設定時，執行緒串列中的物件在借出前也要檢查
+        self._checked = any(kwargs.get(k) is not None for k in ('idle_timeout', 'max_lifetime', 'validate'))
+        self._local = threading.local()
+        self._shards = {}  # 擁有者的弱參照 -> 該執行緒的 deque，供其他執行緒偷取
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def acquire(self, timeout=None):
+        # 只有擁有者從右端取放，偷取者從左端取，deque 兩端的操作都是執行緒安全的
+        item = self._take(self._shard(), True)
+        if item is not _missing:
+            return item
+        if self.shared.idle or self.shared.size < self.shared.max_size:
+            try:
+                return self.shared._acquire(0, False)
+            except PoolTimeout:
+                pass
+
+        deadline = None if timeout is None else _now() + timeout
+        with self._lock:
+            self._waiting += 1  # 讓 release() 暫時把物件還給共用池
+        try:
+            while True:
+                item = self._steal()
+                if item is not _missing:
+                    return item
+                remaining = None if deadline is None else deadline - _now()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout('no object available within {} seconds'.format(timeout))
+                # 分段等待：偷取與等待之間若有物件被放回某個執行緒的串列，下一輪會偷到
+                wait = 0.05 if remaining is None else min(remaining, 0.05)
+                try:
+                    return self.shared._acquire(wait, False)
+                except PoolTimeout:
+                    pass
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def release(self, item):
+        free = self._shard()
+        if len(free) < self.local_size and not self._waiting:
+            free.append((item, _now() if self._checked else None))
+        else:
+            self.shared.release(item)
+
+    def get(self, block=True, timeout=None):
+        return self.acquire(timeout if block else 0)
+
+    put = release
+
+    def _shard(self):
+        try:
+            return self._local.free
+        except AttributeError:
+            free = self._local.free = deque()
+            # 執行緒結束時 threading.local 的內容會被釋放，owner 的弱參照
+            # 回呼把這個串列從 _shards 移除，並把裡面的物件還給共用池
+            owner = self._local.owner = _ShardOwner()
+            with self._lock:
+                self._shards[weakref.ref(owner, self._retire)] = free
+            return free
+
+    def _retire(self, owner_ref):
+        with self._lock:
+            free = self._shards.pop(owner_ref, ())
+        for item, _ in free:
+            self.shared.release(item)
+
+    def _steal(self):
+        with self._lock:
+            shards = list(self._shards.values())
+        for free in shards:
+            item = self._take(free, False)
+            if item is not _missing:
+                return item
+        return _missing
+
+    def _take(self, free, own):
+        """從串列取出一個可用的物件，並做與 BoundedPool 借出時相同的檢查。"""
+        while True:
+            try:
+                item, released = free.pop() if own else free.popleft()
+            except IndexError:
+                return _missing
+            if not self._checked or self._usable(item, released):
+                return item
+            self.shared.discard(item)
+
+    def _usable(self, item, released):
+        shared = self.shared
+        now = _now()
+        if shared.idle_timeout is not None and now - released >= shared.idle_timeout:
+            return False
+        born = shared._born.get(id(item))
+        return (born is None or not shared._too_old(born, now)) and shared._is_valid(item)
+
+
+class _ShardOwner(object):
+    __slots__ = ('__weakref__',)
+
+
+def main():
     def test_object(queue):
         pool = ObjectPool(queue, True)
         print('Inside func: {}'.format(pool.item))
@@ -72,6 +469,17 @@ def main():
     if not sample_queue.empty():
         print(sample_queue.get())
 
+    names = iter(['ham', 'jam'])
+    bounded = BoundedPool(lambda: next(names), max_size=2, min_idle=1)
+    print('Pre-warmed: {}'.format(bounded.idle))
+    with ObjectPool(bounded) as first, ObjectPool(bounded) as second:
+        print('Inside with: {} {}'.format(first, second))
+        try:
+            bounded.acquire(timeout=0.01)
+        except PoolTimeout:
+            print('Pool exhausted')
+    print('Created: {}'.format(bounded.size))
+
 
 if __name__ == '__main__':
     main()
@@ -81,3 +489,7 @@ if __name__ == '__main__':
 # Outside with: yam
 # Inside func: sam
 # Outside func: sam
+# Pre-warmed: 1
+# Inside with: ham jam
+# Pool exhausted
+# Created: 2
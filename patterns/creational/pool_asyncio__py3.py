@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+*這種模式是什麼？
+與 pool.py 中的 BoundedPool 相同，但用於 asyncio：等待物件時不會阻塞事件迴圈。
+
+*這個例子做了什麼？
+AsyncObjectPool 擁有一個 factory（可以是 async 函數），需要時才創建物件，
+總數不超過 max_size。池滿時，等待者依照先來後到（FIFO）排隊，
+被歸還的物件直接交給排在最前面的等待者，後來的呼叫不能插隊。
+等待中的呼叫被取消或逾時都不會遺失物件或名額。
+
+    async with pool.acquire() as conn:
+        ...
+
+*TL;DR80
+asyncio 版本的物件池，公平且可安全取消。
+"""
+
+import asyncio
+import collections
+import inspect
+
+# 交給等待者的特殊值：沒有閒置物件，但名額已留給你，請自行創建
+_CREATE = object()
+
+
+class PoolTimeout(asyncio.TimeoutError):
+    pass
+
+
+class AsyncObjectPool:
+    def __init__(self, factory, max_size, min_idle=0):
+        if not 0 <= min_idle <= max_size:
+            raise ValueError('min_idle must be between 0 and max_size')
+        self._factory = factory
+        self.max_size = max_size
+        self.min_idle = min_idle
+        self._idle = collections.deque()
+        self._waiters = collections.deque()
+        self._size = 0  # 已創建的物件數，包含正在創建中的
+        self._filling = None
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def acquire(self, timeout=None):
+        """`async with pool.acquire() as obj` 或 `obj = await pool.acquire()`。"""
+        return _Checkout(self, timeout)
+
+    async def get(self, timeout=None):
+        if not self._has_waiters():
+            if self._idle:
+                item = self._idle.pop()
+                self._schedule_fill()
+                return item
+            if self._size < self.max_size:
+                self._size += 1
+                return await self._create()
+
+        loop = asyncio.get_event_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        timer = None
+        if timeout is not None:
+            timer = loop.call_later(timeout, self._expire, waiter, timeout)
+        try:
+            item = await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # 物件已交付，但呼叫端同時被取消：把它交還給下一位
+                self._hand_over(waiter.result())
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if item is _CREATE:
+            return await self._create()
+        return item
+
+    def release(self, item):
+        self._hand_over(item)
+
+    def discard(self, item):
+        """丟棄損壞的物件並釋出它的名額。"""
+        self._hand_over(_CREATE)
+
+    async def fill(self):
+        """預先創建物件，直到有 min_idle 個閒置物件。"""
+        while len(self._idle) < self.min_idle and self._size < self.max_size and not self._has_waiters():
+            self._size += 1
+            self._hand_over(await self._create())
+
+    async def _create(self):
+        try:
+            item = self._factory()
+            if inspect.isawaitable(item):
+                item = await item
+        except BaseException:
+            self._hand_over(_CREATE)
+            raise
+        return item
+
+    def _has_waiters(self):
+        # 逾時或被取消的等待者可能還留在佇列前端
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()
+        return bool(self._waiters)
+
+    def _hand_over(self, item):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(item)
+                return
+        if item is _CREATE:
+            self._size -= 1
+        else:
+            self._idle.append(item)
+
+    def _schedule_fill(self):
+        if len(self._idle) < self.min_idle and (self._filling is None or self._filling.done()):
+            self._filling = asyncio.ensure_future(self.fill())
+
+    @staticmethod
+    def _expire(waiter, timeout):
+        if not waiter.done():
+            waiter.set_exception(PoolTimeout('no object available within {} seconds'.format(timeout)))
+
+
+class _Checkout:
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._item = None
+
+    def __await__(self):
+        return self._pool.get(self._timeout).__await__()
+
+    async def __aenter__(self):
+        self._item = await self._pool.get(self._timeout)
+        return self._item
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._pool.release(self._item)
+        self._item = None
+
+
+def main():
+    async def run():
+        names = iter(['ham', 'jam'])
+
+        async def connect():
+            await asyncio.sleep(0)
+            return next(names)
+
+        pool = AsyncObjectPool(connect, max_size=1)
+
+        async def worker(name):
+            async with pool.acquire() as conn:
+                print('{} uses {}'.format(name, conn))
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(worker(n) for n in ['first', 'second', 'third']))
+        try:
+            async with pool.acquire():
+                await pool.get(timeout=0.01)
+        except PoolTimeout:
+            print('Pool exhausted')
+        print('Created: {}'.format(pool.size))
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
+
+### OUTPUT ###
+# first uses ham
+# second uses ham
+# third uses ham
+# Pool exhausted
+# Created: 1
@@ -0,0 +1,5 @@
+from patterns import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__, globals(), {'Delegator': 'delegation_pattern', 'Delegate': 'delegation_pattern'}, ['delegation_pattern']
+)
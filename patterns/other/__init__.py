@@ -0,0 +1,14 @@
+from patterns import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    globals(),
+    {
+        'Blackboard': 'blackboard__py3',
+        'GraphSearch': 'graph_search',
+        'CompactGraph': 'graph_search',
+        'MappedGraph': 'graph_search',
+        'HierachicalStateMachine': 'hsm.hsm',
+    },
+    ['blackboard__py3', 'graph_search', 'hsm'],
+)
@@ -3,65 +3,761 @@
 
 ""
 
+import heapq
+import itertools
+import mmap
+import multiprocessing
+import struct
+import sys
+from array import array
+from collections import OrderedDict, deque, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+class CompactGraph(object):
+
+    """Read-only graph in compressed sparse row form.
+
+    Node names are interned to integer ids; the successors of id `i` are
+    targets[offsets[i]:offsets[i + 1]]. Each edge costs one 4-byte int
+    instead of a reference in a Python list. Edge weights, if any, are kept
+    in a parallel array('d')."""
+
+    def __init__(self, names, offsets, targets, weights=None):
+        self.names = names
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self._ids = dict((name, i) for i, name in enumerate(names))
+
+    @classmethod
+    def from_dict(cls, graph):
+        names = []
+        ids = {}
+        for node, neighbours in graph.items():
+            for name in [node] + list(neighbours):
+                if name not in ids:
+                    ids[name] = len(names)
+                    names.append(name)
+
+        weighted = any(hasattr(neighbours, 'items') for neighbours in graph.values())
+        offsets = array('i', [0])
+        targets = array('i')
+        weights = array('d') if weighted else None
+        for name in names:
+            neighbours = graph.get(name, [])
+            targets.extend(ids[n] for n in neighbours)
+            if weighted:
+                weights.extend(neighbours[n] if hasattr(neighbours, 'items') else 1 for n in neighbours)
+            offsets.append(len(targets))
+        return cls(names, offsets, targets, weights)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    def index(self, name):
+        return self._ids[name]
+
+    def successors(self, i):
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def weighted_successors(self, i):
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        if self.weights is None:
+            return ((target, 1) for target in self.targets[start:stop])
+        return zip(self.targets[start:stop], self.weights[start:stop])
+
+    def reverse(self):
+        """The transposed graph, sharing node names and ids with this one."""
+        counts = array('i', [0]) * (len(self.names) + 1)
+        for target in self.targets:
+            counts[target + 1] += 1
+        for i in range(len(self.names)):
+            counts[i + 1] += counts[i]
+        offsets = array('i', counts)
+        targets = array('i', [0]) * len(self.targets)
+        weights = None if self.weights is None else array('d', [0]) * len(self.targets)
+        for source in range(len(self.names)):
+            for edge in range(self.offsets[source], self.offsets[source + 1]):
+                slot = counts[self.targets[edge]]
+                counts[self.targets[edge]] += 1
+                targets[slot] = source
+                if weights is not None:
+                    weights[slot] = self.weights[edge]
+        reverse = object.__new__(type(self))
+        reverse.__dict__.update(self.__dict__)
+        reverse.offsets, reverse.targets, reverse.weights = offsets, targets, weights
+        return reverse
+
+    def get(self, name, default=None):
+        """dict-like access to the neighbours of `name`: a list of names, or
+        a dict of name to weight for a weighted graph."""
+        if name not in self:
+            return default
+        i = self.index(name)
+        if self.weights is None:
+            return [self.names[t] for t in self.successors(i)]
+        return dict((self.names[t], w) for t, w in self.weighted_successors(i))
+
+
+class MappedGraph(CompactGraph):
+
+    """A CompactGraph read straight out of a file written by save_graph().
+
+    The file is memory-mapped and the arrays are views into it, so opening
+    costs no parsing and the operating system pages in only the parts a
+    search touches. Names are decoded on access and looked up by binary
+    search over an index sorted by name, so no per-node dict is built.
+
+    File layout, every section starting on an 8-byte boundary:
+      header        magic, node count, edge count, flags, name bytes
+      offsets       int32 * (nodes + 1)
+      targets       int32 * edges
+      weights       float64 * edges, only if FLAG_WEIGHTED is set
+      name offsets  int64 * (nodes + 1), into the name blob
+      sorted ids    int32 * nodes, ordered by encoded name
+      name blob     utf-8
+    Numbers are stored in the byte order of the machine that wrote them."""
+
+    MAGIC = b'GSCSR\x00\x00\x01'
+    HEADER = struct.Struct('<8sQQQQ')
+    FLAG_WEIGHTED = 1
+    FLAG_BIG_ENDIAN = 2
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # python 2 has no memoryview.cast; _Section unpacks numbers on access
+        view = memoryview(self._mmap) if hasattr(memoryview, 'cast') else None
+        magic, nodes, edges, flags, blob_size = self.HEADER.unpack_from(self._mmap)
+        if magic != self.MAGIC:
+            raise ValueError('{} is not a graph file'.format(path))
+        if bool(flags & self.FLAG_BIG_ENDIAN) != (sys.byteorder == 'big'):
+            raise ValueError('{} was written with a different byte order'.format(path))
+
+        sections = [('i', nodes + 1), ('i', edges)]
+        if flags & self.FLAG_WEIGHTED:
+            sections.append(('d', edges))
+        sections += [('q', nodes + 1), ('i', nodes)]
+        arrays = []
+        position = _align(self.HEADER.size)
+        for typecode, count in sections:
+            size = count * struct.calcsize(typecode)
+            if view is None:
+                arrays.append(_Section(self._mmap, position, typecode, count))
+            else:
+                arrays.append(view[position:position + size].cast(typecode))
+            position = _align(position + size)
+        self._names_position = position
+
+        self.offsets, self.targets = arrays[0], arrays[1]
+        self.weights = arrays[2] if flags & self.FLAG_WEIGHTED else None
+        self._name_offsets, self._sorted_ids = arrays[-2], arrays[-1]
+        self.names = _MappedNames(self)
+
+    def _name_bytes(self, i):
+        start = self._names_position
+        return self._mmap[start + self._name_offsets[i]:start + self._name_offsets[i + 1]]
+
+    def _find(self, name):
+        try:
+            key = name.encode('utf-8')
+        except AttributeError:
+            return None
+        low, high = 0, len(self._sorted_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_bytes(self._sorted_ids[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._sorted_ids) and self._name_bytes(self._sorted_ids[low]) == key:
+            return self._sorted_ids[low]
+        return None
+
+    def __contains__(self, name):
+        return self._find(name) is not None
+
+    def index(self, name):
+        i = self._find(name)
+        if i is None:
+            raise KeyError(name)
+        return i
+
+    def close(self):
+        for view in (self.offsets, self.targets, self.weights, self._name_offsets, self._sorted_ids):
+            if view is not None:
+                view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+
+class _Section(object):
+
+    """`count` numbers of struct format `typecode` stored at `position` in
+    `buffer`, read one by one, for memoryviews that cannot be cast."""
+
+    def __init__(self, buffer, position, typecode, count):
+        self._buffer = buffer
+        self._position = position
+        self._typecode = typecode
+        self._itemsize = struct.calcsize(typecode)
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._count)
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            count = max(stop - start, 0)
+            return struct.unpack_from(
+                '={}{}'.format(count, self._typecode), self._buffer, self._position + start * self._itemsize
+            )
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return struct.unpack_from('=' + self._typecode, self._buffer, self._position + i * self._itemsize)[0]
+
+    def release(self):
+        pass
+
+
+class _MappedNames(object):
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __len__(self):
+        return len(self._graph._sorted_ids)
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._graph._name_bytes(i).decode('utf-8')
+
+
+def save_graph(graph, path):
+    """Write a dict graph or CompactGraph in the format MappedGraph reads.
+    Node names must be strings."""
+    if not isinstance(graph, CompactGraph):
+        graph = CompactGraph.from_dict(graph)
+    encoded = [graph.names[i].encode('utf-8') for i in range(len(graph))]
+    name_offsets = [0]
+    for name in encoded:
+        name_offsets.append(name_offsets[-1] + len(name))
+    sorted_ids = array('i', sorted(range(len(encoded)), key=encoded.__getitem__))
+
+    flags = MappedGraph.FLAG_BIG_ENDIAN if sys.byteorder == 'big' else 0
+    sections = [array('i', graph.offsets), array('i', graph.targets)]
+    if graph.weights is not None:
+        flags |= MappedGraph.FLAG_WEIGHTED
+        sections.append(array('d', graph.weights))
+    # array has no 64-bit typecode on python 2
+    sections += [struct.pack('={}q'.format(len(name_offsets)), *name_offsets), sorted_ids]
+
+    with open(path, 'wb') as f:
+        f.write(MappedGraph.HEADER.pack(MappedGraph.MAGIC, len(graph), graph.edge_count, flags, name_offsets[-1]))
+        for section in sections:
+            f.write(b'\x00' * (_align(f.tell()) - f.tell()))
+            if isinstance(section, bytes):
+                f.write(section)
+            else:
+                section.tofile(f)
+        f.write(b'\x00' * (_align(f.tell()) - f.tell()))
+        f.write(b''.join(encoded))
+
+
+def load_graph(path):
+    return MappedGraph(path)
+
+
+def _align(position):
+    return (position + 7) & ~7
+
 
 class GraphSearch:
 
     """Graph search emulation in python, from source
-    http://www.python.org/doc/essays/graphs/"""
+    http://www.python.org/doc/essays/graphs/
 
-    def __init__(self, graph):
+    `graph` is either a dict of adjacency lists or a CompactGraph. The
+    searches below run on node ids, which for a dict are the names
+    themselves. For the weighted searches the adjacency lists may be dicts
+    of neighbour to edge cost; plain lists count every edge as 1.
+
+    `nodes_expanded` counts the nodes whose neighbours the last search
+    looked at.
+
+    With `cache_size` set, the results of find_path, find_all_path,
+    find_shortest_path and find_cheapest_path are kept in an LRU cache.
+    Entries are tagged with `version`, which add_edge and remove_edge bump,
+    so a changed graph never serves stale results. Call invalidate() after
+    changing `graph` directly."""
+
+    def __init__(self, graph, cache_size=None):
         self.graph = graph
+        self.nodes_expanded = 0
+        self.version = 0
+        self._reverse = None
+        self._cache = None if cache_size is None else OrderedDict()
+        self._cache_size = cache_size
+        self._hits = self._misses = 0
+        if isinstance(graph, CompactGraph):
+            self._compact = graph
+            self._neighbours = graph.successors
+            self._weighted_neighbours = graph.weighted_successors
+        else:
+            self._compact = None
+            self._neighbours = self._dict_neighbours
+            self._weighted_neighbours = self._dict_weighted_neighbours
 
-    def find_path(self, start, end, path=None):
-        path = path or []
+    def add_edge(self, start, end, weight=None):
+        """Add an edge; `weight` is required to be None for graphs stored
+        as adjacency lists."""
+        self._check_mutable()
+        neighbours = self.graph.setdefault(start, [] if weight is None else {})
+        if hasattr(neighbours, 'items'):
+            neighbours[end] = 1 if weight is None else weight
+        elif weight is not None:
+            raise ValueError('adjacency of {!r} is a list and cannot hold edge costs'.format(start))
+        else:
+            neighbours.append(end)
+        self.invalidate()
 
-        path.append(start)
-        if start == end:
-            return path
-        for node in self.graph.get(start, []):
-            if node not in path:
-                newpath = self.find_path(node, end, path[:])
-                if newpath:
-                    return newpath
+    def remove_edge(self, start, end):
+        self._check_mutable()
+        neighbours = self.graph.get(start, [])
+        if end not in neighbours:
+            raise KeyError((start, end))
+        if hasattr(neighbours, 'items'):
+            del neighbours[end]
+        else:
+            neighbours.remove(end)
+        self.invalidate()
+
+    def _check_mutable(self):
+        if self._compact is not None:
+            raise TypeError('CompactGraph is read-only')
+
+    def invalidate(self):
+        """Forget everything derived from the graph."""
+        self.version += 1
+        self._reverse = None
+
+    def cache_info(self):
+        currsize = 0 if self._cache is None else len(self._cache)
+        return CacheInfo(self._hits, self._misses, self._cache_size, currsize)
+
+    def _cached(self, key, copy, compute):
+        """Look `key` up in the result cache, computing it on a miss.
+        Callers get a copy so that mutating it cannot corrupt the cache."""
+        if self._cache is None:
+            return compute()
+        entry = self._cache.pop(key, None)
+        if entry is not None and entry[0] == self.version:
+            self._hits += 1
+            self.nodes_expanded = 0
+            self._cache[key] = entry
+            return copy(entry[1])
+        self._misses += 1
+        result = compute()
+        self._cache[key] = (self.version, result)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return copy(result)
+
+    def _dict_neighbours(self, node):
+        return self.graph.get(node, [])
+
+    def _dict_weighted_neighbours(self, node):
+        neighbours = self.graph.get(node, [])
+        if hasattr(neighbours, 'items'):
+            return neighbours.items()
+        return ((n, 1) for n in neighbours)
+
+    def _predecessors(self, node):
+        if self._reverse is None:
+            if self._compact is not None:
+                self._reverse = self._compact.reverse()
+            else:
+                self._reverse = {}
+                for source, neighbours in self.graph.items():
+                    for target in neighbours:
+                        self._reverse.setdefault(target, []).append(source)
+        if self._compact is not None:
+            return self._reverse.successors(node)
+        return self._reverse.get(node, [])
+
+    def _names(self, route):
+        if self._compact is None:
+            return route
+        names = self._compact.names
+        return [names[i] for i in route]
+
+    def _prepare(self, start, end, path):
+        """Translate a query to ids. Returns (start, end, blocked) or None
+        when start or end is not a node of a CompactGraph, in which case
+        there is no route between them."""
+        if self._compact is None:
+            return start, end, set(path)
+        if start not in self._compact or end not in self._compact:
+            return None
+        index = self._compact.index
+        blocked = set(index(n) for n in path if n in self._compact)
+        return index(start), index(end), blocked
+
+    def find_path(self, start, end, path=None, strategy='dfs'):
+        """Find a path from `start` to `end`.
+
+        strategy:
+          'dfs'           - the first path found depth-first (the default)
+          'bfs'           - a shortest path, as find_shortest_path
+          'bidirectional' - a shortest path, found by growing breadth-first
+                            frontiers from both ends until they meet. The
+                            reverse adjacency this needs is built on first use.
+        """
+        if strategy == 'dfs':
+            search = self._first_route
+        elif strategy == 'bfs':
+            search = self._shortest_route
+        elif strategy == 'bidirectional':
+            search = self._bidirectional_route
+        else:
+            raise ValueError('unknown search strategy {!r}'.format(strategy))
+        if path:
+            return search(start, end, path)
+        return self._cached(('find_path', strategy, start, end), _copy_path, lambda: search(start, end, []))
 
     def find_all_path(self, start, end, path=None):
-        path = path or []
-        path.append(start)
+        if path:
+            return list(self._routes(start, end, path, None, None))
+        return self._cached(
+            ('find_all_path', start, end), _copy_paths, lambda: list(self._routes(start, end, [], None, None))
+        )
+
+    def _first_route(self, start, end, path):
+        for route in self._routes(start, end, path, None, 1):
+            return route
+        return None
+
+    def iter_all_paths(self, start, end, max_depth=None, limit=None):
+        """Yield the paths of find_all_path one at a time, in the same order.
+
+        The search keeps a single path plus a stack of neighbour iterators,
+        so only the yielded copies are allocated. `max_depth` bounds the
+        number of edges in a path and `limit` the number of paths yielded.
+        """
+        return self._routes(start, end, [], max_depth, limit)
+
+    def _routes(self, start, end, path, max_depth, limit):
+        self.nodes_expanded = 0
+        if limit is not None and limit <= 0:
+            return
         if start == end:
-            return [path]
-        paths = []
-        for node in self.graph.get(start, []):
-            if node not in path:
-                newpaths = self.find_all_path(node, end, path[:])
-                paths.extend(newpaths)
-        return paths
+            yield path + [start]
+            return
+        query = self._prepare(start, end, path)
+        if query is None:
+            return
+        for route in self._depth_first(query[0], query[1], query[2], max_depth, limit):
+            yield path + self._names(route)
+
+    def _depth_first(self, start, end, blocked, max_depth, limit):
+        path = [start]
+        on_path = set(blocked)
+        on_path.add(start)
+        stack = [iter(self._neighbours(start))]
+        self.nodes_expanded += 1
+        found = 0
+        exhausted = object()
+        while stack:
+            node = next(stack[-1], exhausted)
+            if node is exhausted:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            if node in on_path:
+                continue
+            if max_depth is not None and len(path) > max_depth:
+                continue
+            if node == end:
+                yield path + [node]
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+                continue
+            path.append(node)
+            on_path.add(node)
+            stack.append(iter(self._neighbours(node)))
+            self.nodes_expanded += 1
 
     def find_shortest_path(self, start, end, path=None):
-        path = path or []
-        path.append(start)
+        """Breadth-first search: the first time `end` is reached is along a
+        shortest path, which is rebuilt once from the predecessor map.
+        Neighbours are visited in adjacency order, so ties are broken the
+        same way as the depth-first search this replaces."""
+        if path:
+            return self._shortest_route(start, end, path)
+        return self._cached(('find_path', 'bfs', start, end), _copy_path, lambda: self._shortest_route(start, end, []))
+
+    def _shortest_route(self, start, end, path):
+        return self._shortest(self._breadth_first, start, end, path)
 
+    def _bidirectional_route(self, start, end, path):
+        return self._shortest(self._bidirectional, start, end, path)
+
+    def _shortest(self, search, start, end, path):
+        self.nodes_expanded = 0
         if start == end:
-            return path
-        shortest = None
-        for node in self.graph.get(start, []):
-            if node not in path:
-                newpath = self.find_shortest_path(node, end, path[:])
-                if newpath:
-                    if not shortest or len(newpath) < len(shortest):
-                        shortest = newpath
-        return shortest
+            return path + [start]
+        query = self._prepare(start, end, path)
+        if query is None:
+            return None
+        route = search(*query)
+        if route is None:
+            return None
+        return path + self._names(route)
+
+    def _breadth_first(self, start, end, blocked):
+        previous = dict.fromkeys(blocked)
+        previous[start] = None
+        frontier = deque([start])
+        while frontier:
+            current = frontier.popleft()
+            self.nodes_expanded += 1
+            for node in self._neighbours(current):
+                if node in previous:
+                    continue
+                previous[node] = current
+                if node == end:
+                    return self._backtrack(previous, node)
+                frontier.append(node)
+        return None
+
+    def _bidirectional(self, start, end, blocked):
+        """Expand whole levels of the smaller frontier. Once a level touches
+        the other side, the meeting edge with the fewest remaining steps
+        gives a shortest path."""
+        forward, backward = dict.fromkeys(blocked), dict.fromkeys(blocked)
+        forward[start], backward[end] = None, None
+        depth = {(True, start): 0, (False, end): 0}
+        frontiers = {True: [start], False: [end]}
+        while frontiers[True] and frontiers[False]:
+            outward = len(frontiers[True]) <= len(frontiers[False])
+            seen, other = (forward, backward) if outward else (backward, forward)
+            step = self._neighbours if outward else self._predecessors
+            level, best = [], None
+            for current in frontiers[outward]:
+                self.nodes_expanded += 1
+                for node in step(current):
+                    if node in seen:
+                        continue
+                    if node in other:
+                        remaining = depth[(not outward), node]
+                        if best is None or remaining < best[0]:
+                            best = (remaining, current, node)
+                        continue
+                    seen[node] = current
+                    depth[outward, node] = depth[outward, current] + 1
+                    level.append(node)
+            if best is not None:
+                tail, head = (best[1], best[2]) if outward else (best[2], best[1])
+                route = self._backtrack(forward, tail)
+                while head is not None:
+                    route.append(head)
+                    head = backward[head]
+                return route
+            frontiers[outward] = level
+        return None
+
+    def batch_shortest_paths(self, sources, targets=None, workers=None):
+        """Yield (source, {target: shortest path}) for every source, in order.
+
+        Each source gets one breadth-first search that stops once all
+        `targets` (every reachable node when None) are found; unreachable
+        targets are left out. The searches run on `workers` processes
+        (one per CPU by default). The workers receive a CompactGraph copy
+        once, at start-up; with the 'fork' start method it is inherited
+        rather than pickled. workers=1 searches in this process."""
+        compact = self._compact if self._compact is not None else CompactGraph.from_dict(self.graph)
+        targets = None if targets is None else list(targets)
+        sources = list(sources)
+        workers = workers or multiprocessing.cpu_count()
+        if workers == 1 or len(sources) <= 1:
+            search = GraphSearch(compact)
+            for source in sources:
+                yield source, search._shortest_tree(source, targets)
+            return
+
+        if hasattr(multiprocessing, 'get_context') and 'fork' in multiprocessing.get_all_start_methods():
+            pool = multiprocessing.get_context('fork').Pool(workers, _init_batch_worker, (compact, targets))
+        else:  # python 2 always forks where it can
+            pool = multiprocessing.Pool(workers, _init_batch_worker, (compact, targets))
+        try:
+            results = pool.imap(_batch_worker_search, sources, max(1, len(sources) // (workers * 4)))
+            for source in sources:
+                yield source, next(results)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _shortest_tree(self, source, targets):
+        """Breadth-first search from `source` until every target is found.
+        Returns {target: path} for the reachable targets."""
+        if self._compact is None:
+            known, index = (lambda node: True), (lambda node: node)
+        else:
+            known, index = self._compact.__contains__, self._compact.index
+        if not known(source):
+            return {source: [source]} if targets is None or source in targets else {}
+        start = index(source)
+        wanted = None if targets is None else set(index(t) for t in targets if known(t))
+        remaining = None if wanted is None else len(wanted - {start})
+
+        previous = {start: None}
+        frontier = deque([start])
+        while frontier and remaining != 0:
+            current = frontier.popleft()
+            for node in self._neighbours(current):
+                if node not in previous:
+                    previous[node] = current
+                    frontier.append(node)
+                    if wanted is not None and node in wanted:
+                        remaining -= 1
+        if targets is None:
+            found = list(previous)
+        else:
+            found = [index(t) for t in targets if known(t) and index(t) in previous]
+        return dict((self._names([node])[0], self._names(self._backtrack(previous, node))) for node in found)
+
+    def find_cheapest_path(self, start, end):
+        """Dijkstra's algorithm. Returns (path, cost), or (None, inf) when
+        `end` cannot be reached."""
+        return self._cached(
+            ('find_cheapest_path', start, end),
+            lambda result: (_copy_path(result[0]), result[1]),
+            lambda: self.find_path_astar(start, end, None),
+        )
+
+    def find_path_astar(self, start, end, heuristic):
+        """A* search guided by `heuristic(node, end)`, an estimate of the
+        remaining cost that must never exceed the real one. Without a
+        heuristic this is Dijkstra's algorithm. Returns (path, cost), or
+        (None, inf) when `end` cannot be reached.
+
+        Costs must not be negative. The search stops as soon as `end` is
+        taken off the heap."""
+        self.nodes_expanded = 0
+        if start == end:
+            return [start], 0
+        query = self._prepare(start, end, [])
+        if query is None:
+            return None, float('inf')
+        source, target = query[0], query[1]
+        if heuristic is None:
+            estimate = None
+        elif self._compact is None:
+            estimate = lambda node: heuristic(node, end)
+        else:
+            names = self._compact.names
+            estimate = lambda node: heuristic(names[node], end)
+
+        cost = {source: 0}
+        previous = {source: None}
+        tie = itertools.count()
+        heap = [(0, next(tie), 0, source)]
+        while heap:
+            _, _, reached_cost, current = heapq.heappop(heap)
+            if reached_cost > cost[current]:
+                continue  # a cheaper route to `current` was pushed later
+            self.nodes_expanded += 1
+            if current == target:
+                return self._names(self._backtrack(previous, current)), cost[current]
+            for node, weight in self._weighted_neighbours(current):
+                if weight < 0:
+                    raise ValueError('negative edge cost {!r} -> {!r}'.format(*self._names([current, node])))
+                new_cost = cost[current] + weight
+                if node in cost and new_cost >= cost[node]:
+                    continue
+                cost[node] = new_cost
+                previous[node] = current
+                priority = new_cost if estimate is None else new_cost + estimate(node)
+                heapq.heappush(heap, (priority, next(tie), new_cost, node))
+        return None, float('inf')
+
+    @staticmethod
+    def _backtrack(previous, node):
+        route = []
+        while node is not None:
+            route.append(node)
+            node = previous[node]
+        route.reverse()
+        return route
+
+
+_batch_search = None
+_batch_targets = None
+
+
+def _init_batch_worker(compact, targets):
+    global _batch_search, _batch_targets
+    _batch_search = GraphSearch(compact)
+    _batch_targets = targets
+
+
+def _batch_worker_search(source):
+    return _batch_search._shortest_tree(source, _batch_targets)
+
+
+def _copy_path(path):
+    return None if path is None else list(path)
+
+
+def _copy_paths(paths):
+    return [list(path) for path in paths]
+
 
+def main():
+    # example of graph usage
+    graph = {'A': ['B', 'C'], 'B': ['C', 'D'], 'C': ['D'], 'D': ['C'], 'E': ['F'], 'F': ['C']}
 
-# example of graph usage
-graph = {'A': ['B', 'C'], 'B': ['C', 'D'], 'C': ['D'], 'D': ['C'], 'E': ['F'], 'F': ['C']}
+    # initialization of new graph search object
+    graph1 = GraphSearch(graph)
 
-# initialization of new graph search object
-graph1 = GraphSearch(graph)
+    print(graph1.find_path('A', 'D'))
+    print(graph1.find_all_path('A', 'D'))
+    print(graph1.find_shortest_path('A', 'D'))
 
 
-print(graph1.find_path('A', 'D'))
-print(graph1.find_all_path('A', 'D'))
-print(graph1.find_shortest_path('A', 'D'))
+if __name__ == '__main__':
+    main()
 
 ### OUTPUT ###
 # ['A', 'B', 'C', 'D']
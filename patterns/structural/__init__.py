@@ -0,0 +1,34 @@
+from patterns import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    globals(),
+    {
+        'BusinessLogic': '3-tier',
+        'Adapter': 'adapter',
+        'CircleShape': 'bridge',
+        'CompositeGraphic': 'composite',
+        'TextTag': 'decorator',
+        'ComputerFacade': 'facade',
+        'Card': 'flyweight__py3',
+        'FlyweightMeta': 'flyweight_with_metaclass__py3',
+        'RequestController': 'front_controller',
+        'Model': 'mvc',
+        'View': 'mvc',
+        'Controller': 'mvc',
+        'Proxy': 'proxy',
+    },
+    [
+        '3-tier',
+        'adapter',
+        'bridge',
+        'composite',
+        'decorator',
+        'facade',
+        'flyweight__py3',
+        'flyweight_with_metaclass__py3',
+        'front_controller',
+        'mvc',
+        'proxy',
+    ],
+)
@@ -1,7 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from patterns.behavioral.publish_subscribe import Provider, Publisher, Subscriber
+from patterns.behavioral.publish_subscribe import (
+    MessageLog,
+    MessageRing,
+    Provider,
+    Publisher,
+    QueueFull,
+    Subscriber,
+    ThreadedProvider,
+    TopicTrie,
+)
 
 try:
     from unittest.mock import patch, call
@@ -65,3 +80,457 @@ class TestProvider(unittest.TestCase):
             mock_subscriber1_run.assert_has_calls(expected_sub1_calls)
             expected_sub2_calls = [call('sub 2 msg 1'), call('sub 2 msg 2')]
             mock_subscriber2_run.assert_has_calls(expected_sub2_calls)
+
+    def test_messages_notified_during_update_wait_for_the_next_one(self):
+        pro = Provider()
+        sub = Subscriber('sub name', pro)
+        sub.subscribe('ping')
+        sub.subscribe('pong')
+        with patch.object(sub, 'run', side_effect=lambda msg: msg == 'ping' and pro.notify('pong')) as run:
+            pro.notify('ping')
+            pro.update()
+            self.assertEqual(run.call_args_list, [call('ping')])
+            pro.update()
+            self.assertEqual(run.call_args_list, [call('ping'), call('pong')])
+
+
+class TestTopicTrie(unittest.TestCase):
+    def setUp(self):
+        self.trie = TopicTrie()
+        patterns = ['orders.eu.created', 'orders.*.created', 'orders.#', '#', 'orders.*', 'orders.#.created', 'users.#']
+        for pattern in patterns:
+            self.trie.add(pattern, pattern)
+
+    def test_star_matches_exactly_one_level(self):
+        trie = TopicTrie()
+        trie.add('orders.*.created', 'sub')
+        self.assertEqual(trie.match('orders.eu.created'), ['sub'])
+        self.assertEqual(trie.match('orders.created'), [])
+        self.assertEqual(trie.match('orders.eu.de.created'), [])
+
+    def test_hash_matches_any_number_of_levels(self):
+        self.assertEqual(
+            self.trie.match('orders.eu.created'),
+            ['orders.eu.created', 'orders.*.created', 'orders.#', '#', 'orders.#.created'],
+        )
+        self.assertEqual(self.trie.match('orders'), ['orders.#', '#'])
+        self.assertEqual(self.trie.match('orders.created'), ['orders.#', '#', 'orders.*', 'orders.#.created'])
+        self.assertEqual(self.trie.match('users'), ['#', 'users.#'])
+
+    def test_subscriber_matching_through_several_paths_is_returned_once(self):
+        trie = TopicTrie()
+        trie.add('a.#.#', 'sub')
+        self.assertEqual(trie.match('a.b.c'), ['sub'])
+
+    def test_remove_prunes_pattern(self):
+        self.trie.remove('orders.#', 'orders.#')
+        self.assertNotIn('orders.#', self.trie.match('orders.eu.created'))
+        self.assertRaises(ValueError, self.trie.remove, 'orders.#', 'orders.#')
+        self.assertRaises(ValueError, self.trie.remove, 'unknown.topic', 'orders.#')
+
+
+class TestWildcardSubscriptions(unittest.TestCase):
+    def test_wildcard_subscribers_receive_matching_topics(self):
+        pro = Provider()
+        pub = Publisher(pro)
+        eu = Subscriber('eu', pro)
+        eu.subscribe('orders.eu.*')
+        created = Subscriber('created', pro)
+        created.subscribe('orders.*.created')
+        pub.publish('orders.eu.created')
+        pub.publish('orders.us.created')
+        pub.publish('orders.eu.cancelled')
+        with patch.object(eu, 'run') as eu_run, patch.object(created, 'run') as created_run:
+            pro.update()
+        self.assertEqual(eu_run.call_args_list, [call('orders.eu.created'), call('orders.eu.cancelled')])
+        self.assertEqual(created_run.call_args_list, [call('orders.eu.created'), call('orders.us.created')])
+
+    def test_resolution_cache_follows_subscription_changes(self):
+        pro = Provider()
+        sub = Subscriber('sub', pro)
+        self.assertEqual(pro.subscribers_for('orders.eu.created'), ())
+        sub.subscribe('orders.#')
+        self.assertEqual(pro.subscribers_for('orders.eu.created'), (sub,))
+        sub.unsubscribe('orders.#')
+        self.assertEqual(pro.subscribers_for('orders.eu.created'), ())
+
+
+class BatchSubscriber(Subscriber):
+    def __init__(self, name, msg_center):
+        Subscriber.__init__(self, name, msg_center)
+        self.batches = []
+
+    def run_batch(self, msgs):
+        self.batches.append(msgs)
+
+
+class TestBatchDelivery(unittest.TestCase):
+    def test_batch_subscriber_gets_one_call_per_update(self):
+        pro = Provider()
+        pub = Publisher(pro)
+        sub = BatchSubscriber('batch', pro)
+        sub.subscribe('orders.#')
+        for msg in ['orders.1', 'users.1', 'orders.2']:
+            pub.publish(msg)
+        with patch.object(sub, 'run') as run:
+            pro.update()
+            pro.update()
+        self.assertEqual(run.call_count, 0)
+        self.assertEqual(sub.batches, [['orders.1', 'orders.2']])
+
+    def test_batches_are_delivered_after_per_message_subscribers(self):
+        pro = Provider()
+        pub = Publisher(pro)
+        calls = []
+        batch = BatchSubscriber('batch', pro)
+        batch.run_batch = lambda msgs: calls.append(('batch', msgs))
+        batch.subscribe('news')
+        plain = Subscriber('plain', pro)
+        plain.subscribe('news')
+        plain.subscribe('ads')
+        pub.publish('news')
+        pub.publish('ads')
+        pub.publish('news')
+        with patch.object(plain, 'run', side_effect=lambda msg: calls.append(('plain', msg))):
+            pro.update()
+        self.assertEqual(calls, [('plain', 'news'), ('plain', 'ads'), ('plain', 'news'), ('batch', ['news', 'news'])])
+
+    def test_batch_keeps_publish_order_across_subscriptions(self):
+        pro = Provider()
+        pub = Publisher(pro)
+        both = BatchSubscriber('both', pro)
+        both.subscribe('orders.#')
+        both.subscribe('users.#')
+        orders = BatchSubscriber('orders', pro)
+        orders.subscribe('orders.#')
+        for msg in ['orders.1', 'users.1', 'orders.2', 'users.2']:
+            pub.publish(msg)
+        pro.update()
+        self.assertEqual(both.batches, [['orders.1', 'users.1', 'orders.2', 'users.2']])
+        self.assertEqual(orders.batches, [['orders.1', 'orders.2']])
+
+
+class TestMessageRing(unittest.TestCase):
+    def fill(self, ring, count):
+        for i in range(count):
+            ring.append(i)
+
+    def test_fifo_order_across_wraparound(self):
+        ring = MessageRing(3, overflow='raise')
+        self.fill(ring, 3)
+        self.assertEqual(ring.drain(), [0, 1, 2])
+        self.fill(ring, 2)
+        self.assertEqual((len(ring), ring[0], ring[-1], list(ring)), (2, 0, 1, [0, 1]))
+        self.assertRaises(IndexError, ring.__getitem__, 2)
+
+    def test_drop_oldest(self):
+        ring = MessageRing(3, overflow='drop_oldest')
+        self.fill(ring, 5)
+        self.assertEqual((ring.drain(), ring.dropped), ([2, 3, 4], 2))
+
+    def test_drop_newest(self):
+        ring = MessageRing(3, overflow='drop_newest')
+        self.fill(ring, 5)
+        self.assertEqual((ring.drain(), ring.dropped), ([0, 1, 2], 2))
+
+    def test_raise(self):
+        ring = MessageRing(2, overflow='raise')
+        self.fill(ring, 2)
+        self.assertRaises(QueueFull, ring.append, 2)
+        self.assertEqual((list(ring), ring.dropped), ([0, 1], 0))
+
+    def test_block_times_out(self):
+        ring = MessageRing(1, timeout=0.01)
+        ring.append(0)
+        self.assertRaises(QueueFull, ring.append, 1)
+
+    def test_block_waits_for_drain(self):
+        ring = MessageRing(1)
+        ring.append(0)
+        producer = threading.Thread(target=ring.append, args=(1,))
+        producer.start()
+        producer.join(0.05)
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(ring.drain(), [0])
+        producer.join(5)
+        self.assertEqual(ring.drain(), [1])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, MessageRing, 0)
+        self.assertRaises(ValueError, MessageRing, 1, overflow='ignore')
+
+
+class TestBoundedProvider(unittest.TestCase):
+    def test_update_delivers_ring_contents(self):
+        pro = Provider(capacity=2, overflow='drop_oldest')
+        pub = Publisher(pro)
+        sub = Subscriber('sub', pro)
+        sub.subscribe('news.#')
+        for msg in ['news.1', 'news.2', 'news.3']:
+            pub.publish(msg)
+        self.assertEqual((len(pro.msg_queue), pro.msg_queue[0], pro.dropped), (2, 'news.2', 1))
+        with patch.object(sub, 'run') as run:
+            pro.update()
+        self.assertEqual(run.call_args_list, [call('news.2'), call('news.3')])
+        self.assertEqual(len(pro.msg_queue), 0)
+
+    def test_full_provider_raises_by_default(self):
+        pro = Provider(capacity=1)
+        pro.notify('news.1')
+        self.assertRaises(QueueFull, pro.notify, 'news.2')
+        self.assertEqual(list(pro.msg_queue), ['news.1'])
+
+    def test_unbounded_provider_drops_nothing(self):
+        pro = Provider()
+        for i in range(10):
+            pro.notify(i)
+        self.assertEqual(pro.dropped, 0)
+
+
+class Recorder(Subscriber):
+    def __init__(self, name, msg_center, delay=0):
+        Subscriber.__init__(self, name, msg_center)
+        self.delay = delay
+        self.received = []
+        self.running = 0
+        self.overlapped = False
+
+    def run(self, msg):
+        self.running += 1
+        self.overlapped = self.overlapped or self.running > 1
+        time.sleep(self.delay)
+        self.received.append(msg)
+        self.running -= 1
+
+
+@unittest.skipIf(sys.version_info < (3,), 'ThreadedProvider needs concurrent.futures')
+class TestThreadedProvider(unittest.TestCase):
+    def test_each_subscriber_gets_its_messages_in_order_one_at_a_time(self):
+        with ThreadedProvider(max_workers=4) as pro:
+            pro.slice_size = 3
+            subs = [Recorder('sub {}'.format(i), pro) for i in range(3)]
+            for sub in subs:
+                sub.subscribe('tick.#')
+            for i in range(20):
+                pro.notify('tick.{}'.format(i))
+            pro.update()
+            self.assertTrue(pro.drain(timeout=10))
+        for sub in subs:
+            self.assertEqual(sub.received, ['tick.{}'.format(i) for i in range(20)])
+            self.assertFalse(sub.overlapped)
+
+    def test_subscribers_run_in_parallel(self):
+        pro = ThreadedProvider(max_workers=4)
+        subs = [Recorder('sub {}'.format(i), pro, delay=0.2) for i in range(4)]
+        for sub in subs:
+            sub.subscribe('news')
+        pro.notify('news')
+        begin = time.time()
+        pro.close()
+        self.assertLess(time.time() - begin, 0.6)
+        self.assertEqual([sub.received for sub in subs], [['news']] * 4)
+
+    def test_batch_subscribers_are_scheduled_too(self):
+        with ThreadedProvider() as pro:
+            sub = BatchSubscriber('batch', pro)
+            sub.subscribe('news')
+            pro.notify('news')
+            pro.notify('news')
+        self.assertEqual(sub.batches, [['news', 'news']])
+
+    def test_drain_reraises_subscriber_errors(self):
+        pro = ThreadedProvider()
+        sub = Recorder('sub', pro)
+        sub.subscribe('news')
+        with patch.object(sub, 'run', side_effect=ValueError('boom')):
+            pro.notify('news')
+            pro.update()
+            self.assertRaises(ValueError, pro.drain)
+        self.assertTrue(pro.drain())
+        pro.close()
+
+    def test_drain_times_out(self):
+        pro = ThreadedProvider()
+        sub = Recorder('sub', pro, delay=0.2)
+        sub.subscribe('news')
+        pro.notify('news')
+        pro.update()
+        self.assertFalse(pro.drain(timeout=0.01))
+        pro.close()
+        self.assertEqual(sub.received, ['news'])
+
+    def test_update_after_close_does_not_leave_deliveries_pending(self):
+        pro = ThreadedProvider()
+        Recorder('sub', pro).subscribe('news')
+        pro.close()
+        pro.notify('news')
+        self.assertRaises(RuntimeError, pro.update)
+        self.assertTrue(pro.drain(timeout=1))
+
+
+class TestMessageLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_append_and_read(self):
+        with MessageLog(self.directory) as log:
+            self.assertEqual([log.append(msg) for msg in ['a', '', u'caf\xe9']], [0, 1, 2])
+            self.assertEqual(list(log.read()), [(0, 'a'), (1, ''), (2, u'caf\xe9')])
+            self.assertEqual(list(log.read(1, 2)), [(1, '')])
+            self.assertEqual(log.end, 3)
+
+    def test_reopened_log_continues_after_last_message(self):
+        with MessageLog(self.directory, segment_size=64) as log:
+            for i in range(10):
+                log.append('message {}'.format(i))
+            log.commit({'jim': 4})
+        with MessageLog(self.directory, segment_size=64) as log:
+            self.assertEqual((log.end, log.committed('jim'), log.committed('jack')), (10, 4, 0))
+            self.assertEqual(log.append('message 10'), 10)
+            self.assertEqual([msg for _, msg in log.read(8)], ['message 8', 'message 9', 'message 10'])
+
+    def test_segments_roll_over(self):
+        with MessageLog(self.directory, segment_size=64, fsync='always') as log:
+            for i in range(20):
+                log.append('message {:02d}'.format(i))
+            self.assertEqual(list(log.read(13, 15)), [(13, 'message 13'), (14, 'message 14')])
+            self.assertEqual(len(list(log.read())), 20)
+        segments = sorted(name for name in os.listdir(self.directory) if name.endswith('.log'))
+        self.assertEqual(len(segments), 5)
+        self.assertEqual(segments[1], '{:020d}.log'.format(4))
+
+    def test_commit_fsyncs_under_the_policy(self):
+        for fsync, expected in [('always', 3), ('interval', 1), ('never', 0)]:
+            with patch('os.fsync') as sync:
+                log = MessageLog(os.path.join(self.directory, fsync), fsync=fsync, fsync_interval=60)
+                for offset in range(3):
+                    log.commit({'jim': offset})
+                self.assertEqual(sync.call_count, expected if fsync != 'interval' else 0)
+                log.close()
+                self.assertEqual(sync.call_count, expected)
+            with MessageLog(os.path.join(self.directory, fsync)) as log:
+                self.assertEqual(log.committed('jim'), 2)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, MessageLog, self.directory, fsync='sometimes')
+        with MessageLog(self.directory, segment_size=16) as log:
+            self.assertRaises(ValueError, log.append, 'x' * 16)
+
+
+class TestDurableProvider(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_restarted_subscriber_replays_what_it_missed(self):
+        with MessageLog(self.directory) as log:
+            pro = Provider(log=log)
+            jim = Subscriber('jim', pro)
+            jim.subscribe('news.#')
+            pro.notify('news.1')
+            pro.update()
+            pro.notify('news.2')
+            pro.notify('ads.1')
+            pro.notify('news.3')
+            # the process stops before the second update()
+
+        with MessageLog(self.directory) as log:
+            pro = Provider(log=log)
+            jim = Subscriber('jim', pro)
+            jim.subscribe('news.#')
+            with patch.object(jim, 'run') as run:
+                self.assertEqual(pro.replay(jim), 2)
+                self.assertEqual(pro.replay(jim), 0)
+                self.assertEqual(pro.replay(jim, start=0), 3)
+            self.assertEqual(
+                run.call_args_list, [call('news.2'), call('news.3'), call('news.1'), call('news.2'), call('news.3')]
+            )
+            self.assertEqual(log.committed('jim'), 4)
+
+    def test_message_notified_during_update_is_not_committed(self):
+        with MessageLog(self.directory) as log:
+            pro = Provider(capacity=8, log=log)
+            jim = Subscriber('jim', pro)
+            jim.subscribe('news.#')
+            with patch.object(jim, 'run', side_effect=lambda msg: msg == 'news.1' and pro.notify('news.2')):
+                pro.notify('news.1')
+                pro.update()
+            self.assertEqual(log.committed('jim'), 1)
+            # the process stops before the next update()
+
+        with MessageLog(self.directory) as log:
+            pro = Provider(log=log)
+            jim = Subscriber('jim', pro)
+            jim.subscribe('news.#')
+            with patch.object(jim, 'run') as run:
+                self.assertEqual(pro.replay(jim), 1)
+            self.assertEqual(run.call_args_list, [call('news.2')])
+
+    def test_concurrent_notify_keeps_every_message(self):
+        with MessageLog(self.directory) as log:
+            pro = Provider(log=log)
+
+            def publish(name):
+                for i in range(1000):
+                    pro.notify('{}.{}'.format(name, i))
+
+            if hasattr(sys, 'setswitchinterval'):
+                # switch threads often, to give an unguarded append a chance to race
+                self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+                sys.setswitchinterval(1e-6)
+            threads = [threading.Thread(target=publish, args=('t{}'.format(n),)) for n in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            logged = [msg for _, msg in log.read()]
+            self.assertEqual(log.end, 4000)
+            self.assertEqual(logged, list(pro.msg_queue))
+            self.assertEqual(sorted(logged), sorted('t{}.{}'.format(n, i) for n in range(4) for i in range(1000)))
+
+    def test_rejected_messages_are_not_logged(self):
+        for overflow in ['raise', 'drop_newest']:
+            with MessageLog(os.path.join(self.directory, overflow)) as log:
+                pro = Provider(capacity=1, overflow=overflow, log=log)
+                jim = Subscriber('jim', pro)
+                jim.subscribe('news.#')
+                pro.notify('news.1')
+                if overflow == 'raise':
+                    self.assertRaises(QueueFull, pro.notify, 'news.2')
+                else:
+                    pro.notify('news.2')
+                with patch.object(jim, 'run') as run:
+                    pro.update()
+                self.assertEqual(run.call_args_list, [call('news.1')])
+                self.assertEqual((log.end, log.committed('jim')), (1, 1))
+
+    def test_drop_oldest_cannot_be_logged(self):
+        with MessageLog(self.directory) as log:
+            self.assertRaises(ValueError, Provider, capacity=1, overflow='drop_oldest', log=log)
+
+    def test_late_batch_subscriber_replays_from_start(self):
+        with MessageLog(self.directory) as log:
+            pro = Provider(log=log)
+            for msg in ['news.1', 'ads.1', 'news.2']:
+                pro.notify(msg)
+            pro.update()
+            late = BatchSubscriber('late', pro)
+            late.subscribe('news.#')
+            self.assertEqual(pro.replay(late), 2)
+        self.assertEqual(late.batches, [['news.1', 'news.2']])
+
+    @unittest.skipIf(sys.version_info < (3,), 'ThreadedProvider needs concurrent.futures')
+    def test_threaded_provider_commits_after_drain(self):
+        with MessageLog(self.directory) as log:
+            pro = ThreadedProvider(log=log)
+            sub = Recorder('sub', pro, delay=0.05)
+            sub.subscribe('news')
+            pro.notify('news')
+            pro.update()
+            self.assertEqual(log.committed('sub'), 0)
+            pro.close()
+            self.assertEqual(log.committed('sub'), 1)
+
+    def test_provider_without_log_keeps_plain_notify(self):
+        self.assertNotIn('notify', vars(Provider()))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+
+from patterns.behavioral.publish_subscribe_asyncio__py3 import AsyncProvider, Publisher
+
+
+class Recorder:
+    def __init__(self, provider, delay=0):
+        self.provider = provider
+        self.delay = delay
+        self.received = []
+
+    async def run(self, msg):
+        await asyncio.sleep(self.delay)
+        self.received.append(msg)
+
+
+class TestAsyncProvider(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_subscribers_receive_messages_in_order(self):
+        async def scenario():
+            pro = AsyncProvider()
+            dispatcher = asyncio.ensure_future(pro.update())
+            sub = Recorder(pro)
+            pro.subscribe('orders.*', sub)
+            pub = Publisher(pro)
+            for msg in ['orders.1', 'users.1', 'orders.2', 'orders.3']:
+                pub.publish(msg)
+            await pro.close()
+            await dispatcher
+            return sub.received
+
+        self.assertEqual(self.run_async(scenario()), ['orders.1', 'orders.2', 'orders.3'])
+
+    def test_slow_subscriber_does_not_stall_others(self):
+        async def scenario():
+            pro = AsyncProvider()
+            dispatcher = asyncio.ensure_future(pro.update())
+            slow, fast = Recorder(pro, delay=0.05), Recorder(pro)
+            pro.subscribe('news', slow)
+            pro.subscribe('news', fast)
+            pro.notify('news')
+            for _ in range(10):
+                await asyncio.sleep(0)
+            received = (list(slow.received), list(fast.received))
+            await pro.close()
+            await dispatcher
+            return received
+
+        self.assertEqual(self.run_async(scenario()), ([], ['news']))
+
+    def test_full_mailbox_drops_oldest(self):
+        async def scenario():
+            pro = AsyncProvider(mailbox_size=2)
+            dispatcher = asyncio.ensure_future(pro.update())
+            sub = Recorder(pro)
+            pro.subscribe('news.*', sub)
+            for i in range(10):
+                pro.notify('news.{}'.format(i))
+            await pro.close()
+            await dispatcher
+            return sub.received, pro.dropped
+
+        # the dispatcher fills the mailbox before the consumer task starts
+        self.assertEqual(self.run_async(scenario()), (['news.8', 'news.9'], 8))
+
+    def test_full_mailbox_drops_newest(self):
+        async def scenario():
+            pro = AsyncProvider(mailbox_size=2, overflow='drop_newest')
+            dispatcher = asyncio.ensure_future(pro.update())
+            sub = Recorder(pro)
+            pro.subscribe('news.*', sub)
+            for i in range(10):
+                pro.notify('news.{}'.format(i))
+            await pro.close()
+            await dispatcher
+            return sub.received, pro.dropped
+
+        self.assertEqual(self.run_async(scenario()), (['news.0', 'news.1'], 8))
+
+    def test_full_mailbox_does_not_hold_back_others(self):
+        async def scenario():
+            pro = AsyncProvider(mailbox_size=2)
+            dispatcher = asyncio.ensure_future(pro.update())
+            slow, fast = Recorder(pro, delay=0.05), Recorder(pro)
+            pro.subscribe('news.*', slow)
+            pro.subscribe('news.*', fast)
+            for i in range(6):
+                pro.notify('news.{}'.format(i))
+                for _ in range(5):
+                    await asyncio.sleep(0)
+            received = (list(slow.received), list(fast.received))
+            await pro.close()
+            await dispatcher
+            return received, pro.dropped
+
+        (slow, fast), dropped = self.run_async(scenario())
+        self.assertEqual(slow, [])
+        self.assertEqual(fast, ['news.{}'.format(i) for i in range(6)])
+        # news.0 is being handled by the slow subscriber, the mailbox holds two
+        self.assertEqual(dropped, 3)
+
+    def test_unknown_overflow_policy(self):
+        self.assertRaises(ValueError, AsyncProvider, overflow='block')
+
+    def test_failing_subscriber_keeps_consuming(self):
+        errors = []
+        self.loop.set_exception_handler(lambda loop, context: errors.append(context['exception']))
+
+        class Flaky(Recorder):
+            async def run(self, msg):
+                if msg == 'bad':
+                    raise ValueError(msg)
+                await super().run(msg)
+
+        async def scenario():
+            pro = AsyncProvider()
+            dispatcher = asyncio.ensure_future(pro.update())
+            sub = Flaky(pro)
+            pro.subscribe('#', sub)
+            for msg in ['good', 'bad', 'better']:
+                pro.notify(msg)
+            await pro.close()
+            await dispatcher
+            return sub.received
+
+        self.assertEqual(self.run_async(scenario()), ['good', 'better'])
+        self.assertEqual([str(e) for e in errors], ['bad'])
+
+    def test_notify_after_close_raises(self):
+        async def scenario():
+            pro = AsyncProvider()
+            dispatcher = asyncio.ensure_future(pro.update())
+            await pro.close()
+            await dispatcher
+            pro.notify('late')
+
+        self.assertRaises(RuntimeError, self.run_async, scenario())
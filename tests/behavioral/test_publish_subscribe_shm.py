@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import multiprocessing
+import unittest
+
+from patterns.behavioral.publish_subscribe import QueueFull
+from patterns.behavioral.publish_subscribe_shm import SharedMemoryProvider, SharedMemoryReader, shared_memory
+
+try:
+    from unittest.mock import Mock, call
+except ImportError:
+    from mock import Mock, call
+
+
+def collect(handle, topic, results):
+    received = []
+    subscriber = Mock(spec=['run'])
+    subscriber.run.side_effect = received.append
+    with SharedMemoryReader(handle) as reader:
+        reader.subscribe(topic, subscriber)
+        while not reader.closed:
+            reader.update()
+        reader.update()
+    results.put(received)
+
+
+@unittest.skipIf(shared_memory is None, 'multiprocessing.shared_memory needs Python 3.8')
+class TestSharedMemoryProvider(unittest.TestCase):
+    def setUp(self):
+        self.provider = SharedMemoryProvider(capacity=64, max_readers=2, timeout=0.05)
+        self.addCleanup(self.provider.unlink)
+
+    def test_reader_gets_messages_published_after_it_was_added(self):
+        self.provider.notify('before')
+        with SharedMemoryReader(self.provider.add_reader()) as reader:
+            self.assertEqual(reader.read(), [])
+            self.provider.notify('orders.eu.created')
+            self.provider.notify(u'caf\xe9')
+            self.assertEqual(reader.read(), ['orders.eu.created', u'caf\xe9'])
+            self.assertEqual(reader.read(), [])
+
+    def test_reader_delivers_to_matching_subscribers(self):
+        with SharedMemoryReader(self.provider.add_reader()) as reader:
+            subscriber = Mock(spec=['run'])
+            reader.subscribe('orders.#', subscriber)
+            for msg in ['orders.1', 'users.1', 'orders.2']:
+                self.provider.notify(msg)
+            self.assertEqual(reader.update(), 3)
+        self.assertEqual(subscriber.run.call_args_list, [call('orders.1'), call('orders.2')])
+
+    def test_records_wrap_around_the_ring(self):
+        with SharedMemoryReader(self.provider.add_reader()) as reader:
+            for round in range(20):
+                msgs = ['message {} {}'.format(round, i) for i in range(3)]
+                for msg in msgs:
+                    self.provider.notify(msg)
+                self.assertEqual(reader.read(), msgs)
+
+    def test_writer_waits_for_slowest_reader(self):
+        fast = SharedMemoryReader(self.provider.add_reader())
+        slow = SharedMemoryReader(self.provider.add_reader())
+        self.addCleanup(fast.close)
+        for i in range(4):
+            self.provider.notify('msg {}'.format(i))
+            fast.read()
+        self.assertRaises(QueueFull, self.provider.notify, 'msg 4')
+        slow.close()
+        self.provider.notify('msg 4')
+        self.assertEqual(fast.read(), ['msg 4'])
+
+    def test_record_is_not_read_before_it_is_complete(self):
+        with SharedMemoryReader(self.provider.add_reader()) as reader:
+            self.provider.notify('news')
+            buf = self.provider._ring.buf
+            last = self.provider._ring.data_offset + 11
+            # as if the new write position became visible before the last byte
+            buf[last] = ord(b'X')
+            self.assertEqual(reader.read(), [])
+            buf[last] = ord(b's')
+            self.assertEqual(reader.read(), ['news'])
+
+    def test_reader_slots_are_limited(self):
+        self.provider.add_reader()
+        self.provider.add_reader()
+        self.assertRaises(ValueError, self.provider.add_reader)
+
+    def test_message_larger_than_ring(self):
+        self.assertRaises(ValueError, self.provider.notify, 'x' * 64)
+
+    def test_fan_out_to_processes(self):
+        results = multiprocessing.Queue()
+        topics = ['orders.#', 'users.*']
+        workers = [
+            multiprocessing.Process(target=collect, args=(self.provider.add_reader(), topic, results))
+            for topic in topics
+        ]
+        for worker in workers:
+            worker.start()
+        self.provider.timeout = 10
+        published = ['orders.{}'.format(i) if i % 3 else 'users.{}'.format(i) for i in range(100)]
+        for msg in published:
+            self.provider.notify(msg)
+        self.provider.close()
+        received = sorted([results.get(timeout=10), results.get(timeout=10)], key=len)
+        for worker in workers:
+            worker.join(10)
+        self.assertEqual(received[0], [msg for msg in published if msg.startswith('users.')])
+        self.assertEqual(received[1], [msg for msg in published if msg.startswith('orders.')])
@@ -1,8 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from __future__ import print_function
+import copy
+import threading
+import time
 import unittest
-from patterns.creational.lazy_evaluation import Person
+from patterns.creational.lazy_evaluation import (
+    InvalidateOnSet,
+    Person,
+    SlottedPerson,
+    cached_property_ttl,
+    depends_on,
+    invalidate,
+    lazy_property,
+    lazy_property2,
+    lazy_slot_property,
+    threadsafe_lazy_property,
+)
 
 
 class TestDynamicExpanding(unittest.TestCase):
@@ -30,3 +44,235 @@ class TestDynamicExpanding(unittest.TestCase):
         for _ in range(2):
             self.assertEqual(self.John.parents, "Father and mother")
         self.assertEqual(self.John.call_count2, 1)
+
+
+class TestThreadsafeLazyProperty(unittest.TestCase):
+    class Report(object):
+        def __init__(self):
+            self.calls = 0
+            self.started = threading.Event()
+            self.gate = threading.Event()
+            self.gate.set()
+
+        @threadsafe_lazy_property
+        def total(self):
+            self.calls += 1
+            self.started.set()
+            self.gate.wait(5)
+            time.sleep(0.01)
+            return 42
+
+    def test_computed_once_under_concurrency(self):
+        report = self.Report()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(report.total)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(report.calls, 1)
+
+    def test_value_is_cached_in_instance_dict(self):
+        report = self.Report()
+        self.assertEqual(report.total, 42)
+        self.assertEqual(report.__dict__['total'], 42)
+        self.assertNotIn('_lazy_lock__total', report.__dict__)
+
+    def test_instances_do_not_share_a_lock(self):
+        first, second = self.Report(), self.Report()
+        first.gate.clear()
+        thread = threading.Thread(target=lambda: first.total)
+        thread.start()
+        self.assertTrue(first.started.wait(5))
+        # first is still computing; second must not have to wait for it
+        self.assertEqual(second.total, 42)
+        self.assertEqual(first.calls, 1)
+        self.assertNotIn('total', first.__dict__)
+        first.gate.set()
+        thread.join()
+        self.assertEqual(first.total, 42)
+
+    def test_failed_computation_is_retried(self):
+        class Flaky(object):
+            calls = 0
+
+            @threadsafe_lazy_property
+            def value(self):
+                self.calls += 1
+                if self.calls == 1:
+                    raise IOError('try again')
+                return 'ok'
+
+        flaky = Flaky()
+        with self.assertRaises(IOError):
+            flaky.value
+        copied = copy.deepcopy(flaky)
+        self.assertEqual(flaky.value, 'ok')
+        self.assertEqual(copied.value, 'ok')
+
+    def test_failed_computation_is_retried_by_one_waiter(self):
+        class Flaky(object):
+            calls = 0
+            gate = threading.Event()
+
+            @threadsafe_lazy_property
+            def value(self):
+                self.calls += 1
+                self.gate.wait(5)
+                if self.calls == 1:
+                    raise IOError('try again')
+                return 'ok'
+
+        flaky = Flaky()
+        results = []
+
+        def read():
+            try:
+                results.append(flaky.value)
+            except IOError:
+                results.append('failed')
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        Flaky.gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), ['failed'] + ['ok'] * 7)
+        self.assertEqual(flaky.calls, 2)
+
+
+class TestInvalidation(unittest.TestCase):
+    class Order(InvalidateOnSet):
+        def __init__(self, price, quantity):
+            self.price = price
+            self.quantity = quantity
+            self.calls = 0
+
+        @depends_on('price', 'quantity')
+        @lazy_property
+        def subtotal(self):
+            self.calls += 1
+            return self.price * self.quantity
+
+        @depends_on('subtotal')
+        @lazy_property
+        def total(self):
+            return self.subtotal + 1
+
+        @cached_property_ttl(60, depends_on=['quantity'])
+        def label(self):
+            return '{} items'.format(self.quantity)
+
+        @lazy_property2
+        def parents(self):
+            return 'Father and mother'
+
+    def test_setting_source_drops_derived_values(self):
+        order = self.Order(2, 3)
+        self.assertEqual(order.total, 7)
+        order.price = 10
+        self.assertNotIn('subtotal', order.__dict__)
+        self.assertNotIn('total', order.__dict__)
+        self.assertEqual(order.total, 31)
+        self.assertEqual(order.calls, 2)
+
+    def test_unrelated_attribute_keeps_cache(self):
+        order = self.Order(2, 3)
+        order.subtotal
+        order.note = 'gift'
+        self.assertEqual(order.subtotal, 6)
+        self.assertEqual(order.calls, 1)
+
+    def test_ttl_dependency(self):
+        order = self.Order(2, 3)
+        self.assertEqual(order.label, '3 items')
+        order.quantity = 4
+        self.assertEqual(order.label, '4 items')
+
+    def test_invalidate(self):
+        order = self.Order(2, 3)
+        order.subtotal
+        order.parents
+        invalidate(order, 'subtotal')
+        invalidate(order, 'parents')
+        self.assertNotIn('subtotal', order.__dict__)
+        self.assertNotIn('_lazy__parents', order.__dict__)
+        self.assertEqual(order.subtotal, 6)
+        self.assertEqual(order.calls, 2)
+
+    def test_invalidate_leaves_plain_attributes_alone(self):
+        order = self.Order(2, 3)
+        invalidate(order, 'price')
+        self.assertEqual(order.price, 2)
+
+
+class TestCachedPropertyTtl(unittest.TestCase):
+    class Clock(object):
+        def __init__(self):
+            self.calls = 0
+
+        @cached_property_ttl(0.05)
+        def reading(self):
+            self.calls += 1
+            return self.calls
+
+    def test_value_expires(self):
+        clock = self.Clock()
+        self.assertEqual(clock.reading, 1)
+        self.assertEqual(clock.reading, 1)
+        time.sleep(0.06)
+        self.assertEqual(clock.reading, 2)
+
+    def test_class_access_returns_descriptor(self):
+        self.assertIsInstance(self.Clock.reading, cached_property_ttl)
+        self.assertEqual(self.Clock.reading.__name__, 'reading')
+
+
+class TestLazySlotProperty(unittest.TestCase):
+    def setUp(self):
+        self.John = SlottedPerson('John', 'Coder')
+
+    def test_has_no_instance_dict(self):
+        self.assertFalse(hasattr(self.John, '__dict__'))
+
+    def test_relatives_not_computed_before_access(self):
+        self.assertFalse(hasattr(self.John, '_lazy__relatives'))
+
+    def test_relatives_stored_in_slot(self):
+        self.assertEqual(self.John.relatives, 'Many relatives.')
+        self.assertEqual(self.John._lazy__relatives, 'Many relatives.')
+
+    def test_computed_once(self):
+        class Counter(object):
+            __slots__ = ('calls', '_lazy__value')
+
+            def __init__(self):
+                self.calls = 0
+
+            @lazy_slot_property
+            def value(self):
+                self.calls += 1
+                return None
+
+        counter = Counter()
+        self.assertIsNone(counter.value)
+        self.assertIsNone(counter.value)
+        self.assertEqual(counter.calls, 1)
+        invalidate(counter, 'value')
+        invalidate(counter, 'value')
+        counter.value
+        self.assertEqual(counter.calls, 2)
+
+    def test_missing_slot(self):
+        class Broken(object):
+            __slots__ = ()
+
+            @lazy_slot_property
+            def value(self):
+                return 1
+
+        with self.assertRaises(TypeError):
+            Broken().value
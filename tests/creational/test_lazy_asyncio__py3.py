@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+
+from patterns.creational.lazy_evaluation import async_lazy_property, invalidate
+
+
+class Profile(object):
+    def __init__(self, failures=0):
+        self.calls = 0
+        self.failures = failures
+
+    @async_lazy_property
+    async def friends(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.calls <= self.failures:
+            raise IOError('service unavailable')
+        return ['Jane', 'Jim']
+
+
+class TestAsyncLazyProperty(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_concurrent_awaiters_share_one_call(self):
+        profile = Profile()
+
+        async def scenario():
+            return await asyncio.gather(profile.friends, profile.friends, profile.friends)
+
+        self.assertEqual(self.run_async(scenario()), [['Jane', 'Jim']] * 3)
+        self.assertEqual(profile.calls, 1)
+
+    def test_result_is_cached(self):
+        profile = Profile()
+
+        async def scenario():
+            first = await profile.friends
+            return first, await profile.friends
+
+        first, second = self.run_async(scenario())
+        self.assertIs(first, second)
+        self.assertEqual(profile.calls, 1)
+
+    def test_failures_are_not_cached(self):
+        profile = Profile(failures=1)
+
+        async def scenario():
+            results = await asyncio.gather(profile.friends, profile.friends, return_exceptions=True)
+            self.assertTrue(all(isinstance(r, IOError) for r in results))
+            return await profile.friends
+
+        self.assertEqual(self.run_async(scenario()), ['Jane', 'Jim'])
+        self.assertEqual(profile.calls, 2)
+
+    def test_cancelled_task_is_not_cached(self):
+        profile = Profile()
+
+        async def scenario():
+            profile.friends
+            profile.__dict__['_lazy__friends'].cancel()
+            await asyncio.sleep(0)
+            return await profile.friends
+
+        self.assertEqual(self.run_async(scenario()), ['Jane', 'Jim'])
+
+    def test_cancelling_one_awaiter_leaves_the_others(self):
+        profile = Profile()
+
+        async def scenario():
+            impatient = asyncio.ensure_future(profile.friends)
+            patient = asyncio.ensure_future(profile.friends)
+            await asyncio.sleep(0)
+            impatient.cancel()
+            return await asyncio.gather(impatient, patient, return_exceptions=True)
+
+        impatient, patient = self.run_async(scenario())
+        self.assertIsInstance(impatient, asyncio.CancelledError)
+        self.assertEqual(patient, ['Jane', 'Jim'])
+        self.assertEqual(profile.calls, 1)
+
+    def test_invalidate(self):
+        profile = Profile()
+
+        async def scenario():
+            await profile.friends
+            invalidate(profile, 'friends')
+            return await profile.friends
+
+        self.run_async(scenario())
+        self.assertEqual(profile.calls, 2)
+
+    def test_class_access_returns_descriptor(self):
+        self.assertIsInstance(Profile.friends, async_lazy_property)
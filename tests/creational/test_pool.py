@@ -1,12 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import gc
+import threading
+import time
 import unittest
+import weakref
 
 try:
     import queue
 except ImportError:  # python 2.x compatibility
     import Queue as queue
-from patterns.creational.pool import ObjectPool
+from patterns.creational.pool import BoundedPool, ObjectPool, PoolTimeout, ShardedPool
 
 
 class TestPool(unittest.TestCase):
@@ -54,3 +58,340 @@ class TestNaitivePool(unittest.TestCase):
     # print('Outside func: {}'.format(sample_queue.get()))
 
     # if not sample_queue.empty():
+
+
+class TestBoundedPool(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+
+    def factory(self):
+        self.created.append(object())
+        return self.created[-1]
+
+    def test_objects_are_created_lazily(self):
+        pool = BoundedPool(self.factory, max_size=2)
+        self.assertEqual(pool.size, 0)
+        first = pool.acquire()
+        self.assertEqual(self.created, [first])
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(pool.size, 1)
+
+    def test_min_idle_is_prewarmed(self):
+        pool = BoundedPool(self.factory, max_size=3, min_idle=2)
+        self.assertEqual((pool.size, pool.idle), (2, 2))
+        pool.acquire()
+        self.assertEqual((pool.size, pool.idle), (3, 2))
+        pool.acquire()
+        self.assertEqual((pool.size, pool.idle), (3, 1))
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = BoundedPool(self.factory, max_size=1)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(timeout=0.01)
+        with self.assertRaises(queue.Empty):
+            pool.get(block=False)
+        self.assertEqual(len(self.created), 1)
+
+    def test_release_wakes_waiting_acquire(self):
+        pool = BoundedPool(self.factory, max_size=1)
+        item = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, [item])
+        timer.start()
+        self.assertIs(pool.acquire(timeout=5), item)
+        timer.join()
+
+    def test_failed_creation_frees_its_slot(self):
+        def broken():
+            raise RuntimeError('no connection')
+
+        pool = BoundedPool(broken, max_size=1)
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+        self.assertEqual(pool.size, 0)
+
+    def test_failed_prefill_does_not_fail_checkout(self):
+        calls = []
+
+        def flaky():
+            calls.append(None)
+            if len(calls) == 2:
+                raise RuntimeError('no connection')
+            return len(calls)
+
+        pool = BoundedPool(flaky, max_size=2, min_idle=1)
+        item = pool.acquire()
+        self.assertEqual((item, pool.size, pool.idle), (1, 1, 0))
+        pool.release(item)
+        self.assertEqual(pool.acquire(), 1)
+        self.assertEqual(pool.acquire(timeout=0), 3)
+        self.assertEqual(pool.size, 2)
+
+    def test_usable_with_object_pool(self):
+        pool = BoundedPool(self.factory, max_size=1)
+        with ObjectPool(pool) as item:
+            self.assertEqual(pool.idle, 0)
+        self.assertEqual(pool.idle, 1)
+        self.assertIs(pool.acquire(), item)
+
+    def test_min_idle_cannot_exceed_max_size(self):
+        with self.assertRaises(ValueError):
+            BoundedPool(self.factory, max_size=1, min_idle=2)
+
+
+class TestBoundedPoolEviction(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+        self.disposed = []
+
+    def factory(self):
+        self.created.append(len(self.created))
+        return self.created[-1]
+
+    def pool(self, **kwargs):
+        kwargs.setdefault('reap_interval', 60)
+        pool = BoundedPool(self.factory, dispose=self.disposed.append, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_idle_objects_are_evicted_down_to_min_idle(self):
+        pool = self.pool(max_size=3, min_idle=1, idle_timeout=0.01)
+        items = [pool.acquire() for _ in range(3)]
+        for item in items:
+            pool.release(item)
+        time.sleep(0.02)
+        self.assertEqual(pool.evict(), 2)
+        self.assertEqual((pool.size, pool.idle), (1, 1))
+        self.assertEqual(self.disposed, [0, 1])
+
+    def test_old_objects_are_replaced(self):
+        pool = self.pool(max_size=2, min_idle=1, max_lifetime=0.01)
+        time.sleep(0.02)
+        self.assertEqual(pool.evict(), 1)
+        self.assertEqual(self.disposed, [0])
+        self.assertEqual(pool.acquire(), 1)
+
+    def test_old_objects_are_not_handed_out_or_returned(self):
+        pool = self.pool(max_size=2, max_lifetime=0.01)
+        first = pool.acquire()
+        second = pool.acquire()
+        pool.release(first)
+        time.sleep(0.02)
+        self.assertEqual(pool.acquire(), 2)
+        pool.release(second)
+        self.assertEqual(self.disposed, [0, 1])
+        self.assertEqual(pool.size, 1)
+
+    def test_invalid_objects_are_discarded_on_checkout(self):
+        broken = set([0])
+        pool = BoundedPool(self.factory, max_size=1, validate=lambda item: item not in broken)
+        pool.release(pool.acquire())
+        self.assertEqual(pool.acquire(), 1)
+        self.assertEqual(pool.size, 1)
+
+    def test_validate_errors_count_as_invalid(self):
+        def validate(item):
+            raise IOError('connection reset')
+
+        pool = BoundedPool(self.factory, max_size=1, validate=validate)
+        pool.release(pool.acquire())
+        self.assertEqual(pool.acquire(), 1)
+
+    def test_discard(self):
+        pool = self.pool(max_size=1)
+        pool.discard(pool.acquire())
+        self.assertEqual(pool.size, 0)
+        self.assertEqual(pool.acquire(timeout=0), 1)
+
+    def test_background_reaper(self):
+        pool = self.pool(max_size=1, idle_timeout=0.01, reap_interval=0.01)
+        pool.release(pool.acquire())
+        deadline = time.time() + 5
+        while pool.idle and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual((pool.size, pool.idle), (0, 0))
+
+    def test_reaper_survives_factory_errors(self):
+        def broken():
+            raise RuntimeError('no connection')
+
+        def wait_for_destroyed(count):
+            deadline = time.time() + 5
+            while pool.metrics.snapshot()['destroyed'] < count and time.time() < deadline:
+                time.sleep(0.01)
+            return pool.metrics.snapshot()['destroyed']
+
+        pool = self.pool(max_size=2, min_idle=1, max_lifetime=0.02, reap_interval=0.01)
+        pool._factory = broken
+        # the reaper retires the old object, then fails to create its replacement
+        self.assertEqual(wait_for_destroyed(1), 1)
+        pool._factory = self.factory
+        pool.release(pool.acquire())
+        self.assertGreaterEqual(wait_for_destroyed(2), 2)
+        self.assertTrue(pool._reaper.is_alive())
+
+    def test_reaper_stops_when_pool_is_collected(self):
+        pool = BoundedPool(self.factory, max_size=1, idle_timeout=1, reap_interval=0.01)
+        reaper, pool_ref = pool._reaper, weakref.ref(pool)
+        del pool
+        gc.collect()
+        self.assertIsNone(pool_ref())
+        reaper.join(5)
+        self.assertFalse(reaper.is_alive())
+
+    def test_close_disposes_idle_objects(self):
+        pool = self.pool(max_size=2, min_idle=2, idle_timeout=1)
+        pool.close()
+        self.assertEqual(sorted(self.disposed), [0, 1])
+        self.assertEqual(pool.size, 0)
+
+
+class TestPoolMetrics(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.pool = BoundedPool(object, max_size=2, min_idle=1, metrics_hook=self.record)
+
+    def record(self, event, value):
+        self.events.append(event)
+
+    def test_snapshot(self):
+        first = self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire(timeout=0.01)
+        self.pool.discard(first)
+
+        snapshot = self.pool.snapshot()
+        # discard() makes room for a new pre-warmed object
+        self.assertEqual(snapshot['created'], 3)
+        self.assertEqual(snapshot['destroyed'], 1)
+        self.assertEqual(snapshot['acquired'], 2)
+        self.assertEqual(snapshot['timeouts'], 1)
+        self.assertEqual((snapshot['size'], snapshot['in_use'], snapshot['max_size']), (2, 1, 2))
+        self.assertGreaterEqual(snapshot['wait_max'], 0.01)
+
+    def test_wait_histogram(self):
+        self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire(timeout=0.02)
+        histogram = dict(self.pool.snapshot()['wait_histogram'])
+        self.assertEqual(sum(histogram.values()), 3)
+        self.assertEqual(histogram[0.05], 1)
+        self.assertEqual(histogram[float('inf')], 0)
+
+    def test_hook_receives_events(self):
+        self.pool.release(self.pool.acquire())
+        self.assertEqual(self.events, ['create', 'acquire', 'create'])
+
+
+class TestShardedPool(unittest.TestCase):
+    def test_objects_stay_with_releasing_thread(self):
+        pool = ShardedPool(object, max_size=4, local_size=2)
+        item = pool.acquire()
+        pool.release(item)
+        self.assertIs(pool.acquire(), item)
+        self.assertEqual(pool.shared.snapshot()['acquired'], 1)
+
+    def test_steals_from_other_threads(self):
+        pool = ShardedPool(object, max_size=1)
+        item = pool.acquire()
+        other = threading.Thread(target=pool.release, args=(item,))
+        other.start()
+        other.join()
+        self.assertIs(pool.acquire(timeout=1), item)
+
+    def test_overflow_goes_to_shared_pool(self):
+        pool = ShardedPool(object, max_size=3, local_size=1)
+        items = [pool.acquire() for _ in range(3)]
+        for item in items:
+            pool.release(item)
+        self.assertEqual(pool.shared.idle, 2)
+
+    def test_timeout(self):
+        pool = ShardedPool(object, max_size=1)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(timeout=0.01)
+
+    def test_usable_with_object_pool(self):
+        pool = ShardedPool(object, max_size=1)
+        with ObjectPool(pool) as item:
+            pass
+        self.assertIs(pool.acquire(timeout=0), item)
+
+    def test_thread_local_objects_are_validated(self):
+        broken = set()
+        pool = ShardedPool(object, max_size=2, validate=lambda item: item not in broken)
+        item = pool.acquire()
+        pool.release(item)
+        broken.add(item)
+        self.assertIsNot(pool.acquire(), item)
+        self.assertEqual(pool.shared.snapshot()['destroyed'], 1)
+
+    def test_thread_local_objects_expire(self):
+        pool = ShardedPool(object, max_size=2, idle_timeout=0.01)
+        self.addCleanup(pool.shared.close)
+        item = pool.acquire()
+        pool.release(item)
+        time.sleep(0.02)
+        self.assertIsNot(pool.acquire(), item)
+
+    def test_shard_is_dropped_when_its_thread_exits(self):
+        pool = ShardedPool(object, max_size=1)
+        item = pool.acquire()
+        other = threading.Thread(target=pool.release, args=(item,))
+        other.start()
+        other.join()
+        # python 2 clears the thread's locals only after join() returns
+        deadline = time.time() + 5
+        while len(pool._shards) > 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(pool._shards), 1)  # only this thread's
+        self.assertEqual(pool.shared.idle, 1)
+        self.assertIs(pool.acquire(timeout=0), item)
+
+
+class TestPoolThroughput(unittest.TestCase):
+    """
+    Checkout throughput of a queue.Queue behind ObjectPool against
+    ShardedPool. Prints operations per second and checks that no object is
+    ever handed to two threads at once.
+    """
+
+    OPERATIONS = 20000
+
+    def hammer(self, pool, threads):
+        in_use = set()
+        errors = []
+        guard = threading.Lock()
+
+        def work(count):
+            for _ in range(count):
+                with ObjectPool(pool) as item:
+                    with guard:
+                        if item in in_use:
+                            errors.append(item)
+                        in_use.add(item)
+                    with guard:
+                        in_use.discard(item)
+
+        workers = [threading.Thread(target=work, args=(self.OPERATIONS // threads,)) for _ in range(threads)]
+        began = time.time()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        return self.OPERATIONS / (time.time() - began)
+
+    def test_throughput(self):
+        for threads in (1, 8, 32):
+            sample_queue = queue.Queue()
+            for i in range(16):
+                sample_queue.put(i)
+            baseline = self.hammer(sample_queue, threads)
+            sharded = self.hammer(ShardedPool(object, max_size=16), threads)
+            report = '{:>3} threads: ObjectPool {:>9.0f} ops/s, ShardedPool {:>9.0f} ops/s'
+            print(report.format(threads, baseline, sharded))
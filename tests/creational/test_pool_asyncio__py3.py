@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+
+from patterns.creational.pool_asyncio__py3 import AsyncObjectPool, PoolTimeout
+
+
+class TestAsyncObjectPool(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.created = []
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    async def factory(self):
+        await asyncio.sleep(0)
+        self.created.append('conn {}'.format(len(self.created)))
+        return self.created[-1]
+
+    def test_async_with_returns_object_to_pool(self):
+        pool = AsyncObjectPool(self.factory, max_size=2)
+
+        async def scenario():
+            async with pool.acquire() as conn:
+                self.assertEqual(conn, 'conn 0')
+                self.assertEqual(pool.idle, 0)
+            self.assertEqual(pool.idle, 1)
+            self.assertEqual(await pool.acquire(), 'conn 0')
+
+        self.run_async(scenario())
+        self.assertEqual(pool.size, 1)
+
+    def test_sync_factory(self):
+        pool = AsyncObjectPool(list, max_size=1)
+        self.assertEqual(self.run_async(pool.get()), [])
+
+    def test_waiters_are_served_in_order(self):
+        pool = AsyncObjectPool(self.factory, max_size=1)
+        served = []
+
+        async def worker(name):
+            async with pool.acquire():
+                served.append(name)
+                await asyncio.sleep(0)
+
+        async def scenario():
+            # start the workers one by one: gather() only keeps argument order from 3.7
+            workers = []
+            for i in range(5):
+                workers.append(asyncio.ensure_future(worker(i)))
+                await asyncio.sleep(0)
+            await asyncio.gather(*workers)
+
+        self.run_async(scenario())
+        self.assertEqual(served, [0, 1, 2, 3, 4])
+        self.assertEqual(self.created, ['conn 0'])
+
+    def test_timeout(self):
+        pool = AsyncObjectPool(self.factory, max_size=1)
+
+        async def scenario():
+            await pool.get()
+            with self.assertRaises(PoolTimeout):
+                await pool.get(timeout=0.01)
+
+        self.run_async(scenario())
+
+    def test_cancelled_waiter_does_not_lose_object(self):
+        pool = AsyncObjectPool(self.factory, max_size=1)
+
+        async def scenario():
+            conn = await pool.get()
+            waiter = asyncio.ensure_future(pool.get())
+            await asyncio.sleep(0)
+            pool.release(conn)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual(await pool.get(timeout=1), conn)
+
+        self.run_async(scenario())
+        self.assertEqual(len(self.created), 1)
+
+    def test_failed_creation_passes_slot_to_waiter(self):
+        attempts = []
+
+        async def flaky():
+            attempts.append(None)
+            await asyncio.sleep(0)
+            if len(attempts) == 1:
+                raise RuntimeError('no connection')
+            return 'conn'
+
+        pool = AsyncObjectPool(flaky, max_size=1)
+
+        async def scenario():
+            first = asyncio.ensure_future(pool.get())
+            second = asyncio.ensure_future(pool.get(timeout=1))
+            with self.assertRaises(RuntimeError):
+                await first
+            self.assertEqual(await second, 'conn')
+
+        self.run_async(scenario())
+        self.assertEqual(pool.size, 1)
+
+    def test_discard_frees_slot(self):
+        pool = AsyncObjectPool(self.factory, max_size=1)
+
+        async def scenario():
+            conn = await pool.get()
+            pool.discard(conn)
+            self.assertEqual(await pool.get(timeout=1), 'conn 1')
+
+        self.run_async(scenario())
+
+    def test_min_idle_is_refilled_in_background(self):
+        pool = AsyncObjectPool(self.factory, max_size=3, min_idle=1)
+
+        async def scenario():
+            await pool.fill()
+            self.assertEqual(pool.idle, 1)
+            await pool.get()
+            await asyncio.sleep(0.01)
+            self.assertEqual((pool.size, pool.idle), (2, 1))
+
+        self.run_async(scenario())
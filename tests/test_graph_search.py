@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import unittest
+from patterns.other.graph_search import CompactGraph, GraphSearch, MappedGraph, _Section, load_graph, save_graph
+
+
+def is_path(graph, path, start, end):
+    """Whether `path` walks edges of `graph` from `start` to `end`. Ties
+    between equally short paths depend on dict order, which python 2 does
+    not keep, so tests check these properties instead of one tie-break."""
+    return path[0] == start and path[-1] == end and all(b in graph[a] for a, b in zip(path, path[1:]))
+
+
+class GraphSearchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = {'A': ['B', 'C'], 'B': ['C', 'D'], 'C': ['D'], 'D': ['C'], 'E': ['F'], 'F': ['C']}
+        cls.search = GraphSearch(cls.graph)
+
+    def test_find_path(cls):
+        cls.assertEqual(cls.search.find_path('A', 'D'), ['A', 'B', 'C', 'D'])
+
+    def test_find_all_path(cls):
+        expected = [['A', 'B', 'C', 'D'], ['A', 'B', 'D'], ['A', 'C', 'D']]
+        cls.assertEqual(cls.search.find_all_path('A', 'D'), expected)
+
+    def test_shortest_path(cls):
+        cls.assertEqual(cls.search.find_shortest_path('A', 'D'), ['A', 'B', 'D'])
+
+    def test_shortest_path_to_itself(cls):
+        cls.assertEqual(cls.search.find_shortest_path('A', 'A'), ['A'])
+
+    def test_shortest_path_unreachable(cls):
+        cls.assertIsNone(cls.search.find_shortest_path('D', 'A'))
+        cls.assertIsNone(cls.search.find_shortest_path('A', 'Z'))
+
+    def test_shortest_path_keeps_prefix(cls):
+        cls.assertEqual(cls.search.find_shortest_path('B', 'D', ['A']), ['A', 'B', 'D'])
+        cls.assertIsNone(cls.search.find_shortest_path('E', 'D', ['A', 'C']))
+
+    def test_iter_all_paths_matches_find_all_path(cls):
+        cls.assertEqual(list(cls.search.iter_all_paths('A', 'D')), cls.search.find_all_path('A', 'D'))
+
+    def test_iter_all_paths_is_lazy(cls):
+        paths = cls.search.iter_all_paths('A', 'D')
+        cls.assertEqual(next(paths), ['A', 'B', 'C', 'D'])
+        cls.assertEqual(next(paths), ['A', 'B', 'D'])
+
+    def test_iter_all_paths_max_depth(cls):
+        cls.assertEqual(list(cls.search.iter_all_paths('A', 'D', max_depth=2)), [['A', 'B', 'D'], ['A', 'C', 'D']])
+        cls.assertEqual(list(cls.search.iter_all_paths('A', 'D', max_depth=1)), [])
+
+    def test_iter_all_paths_limit(cls):
+        cls.assertEqual(list(cls.search.iter_all_paths('A', 'D', limit=1)), [['A', 'B', 'C', 'D']])
+        cls.assertEqual(list(cls.search.iter_all_paths('A', 'D', limit=0)), [])
+
+    def test_iter_all_paths_to_itself(cls):
+        cls.assertEqual(list(cls.search.iter_all_paths('A', 'A')), [['A']])
+
+    def test_find_path_strategies(cls):
+        cls.assertEqual(cls.search.find_path('A', 'D', strategy='bfs'), ['A', 'B', 'D'])
+        path = cls.search.find_path('A', 'D', strategy='bidirectional')
+        cls.assertEqual(len(path), 3)
+        cls.assertTrue(is_path(cls.graph, path, 'A', 'D'))
+        cls.assertEqual(cls.search.find_path('E', 'D', strategy='bidirectional'), ['E', 'F', 'C', 'D'])
+        cls.assertEqual(cls.search.find_path('A', 'A', strategy='bidirectional'), ['A'])
+        cls.assertIsNone(cls.search.find_path('D', 'A', strategy='bidirectional'))
+        cls.assertIsNone(cls.search.find_path('A', 'Z', strategy='bidirectional'))
+
+    def test_find_path_unknown_strategy(cls):
+        with cls.assertRaises(ValueError):
+            cls.search.find_path('A', 'D', strategy='best')
+
+    def test_bidirectional_keeps_prefix(cls):
+        cls.assertEqual(cls.search.find_path('B', 'D', ['A'], strategy='bidirectional'), ['A', 'B', 'D'])
+        cls.assertIsNone(cls.search.find_path('E', 'D', ['A', 'C'], strategy='bidirectional'))
+
+    def test_nodes_expanded(cls):
+        cls.search.find_path('A', 'D', strategy='bfs')
+        cls.assertEqual(cls.search.nodes_expanded, 2)
+        cls.search.find_path('A', 'D', strategy='bidirectional')
+        cls.assertEqual(cls.search.nodes_expanded, 2)
+
+    def test_cheapest_path_counts_unweighted_edges_as_one(cls):
+        cls.assertEqual(cls.search.find_cheapest_path('A', 'D'), (['A', 'B', 'D'], 2))
+
+
+class CompactGraphSearchTest(GraphSearchTest):
+    @classmethod
+    def setUpClass(cls):
+        super(CompactGraphSearchTest, cls).setUpClass()
+        cls.search = GraphSearch(CompactGraph.from_dict(cls.graph))
+
+
+class MappedGraphSearchTest(GraphSearchTest):
+    @classmethod
+    def setUpClass(cls):
+        super(MappedGraphSearchTest, cls).setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, 'graph.bin')
+        save_graph(cls.graph, cls.path)
+        cls.mapped = load_graph(cls.path)
+        cls.search = GraphSearch(cls.mapped)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.search = None
+        cls.mapped.close()
+        shutil.rmtree(cls.directory)
+
+    def test_names_are_read_from_file(cls):
+        cls.assertEqual(list(cls.mapped.names), ['A', 'B', 'C', 'D', 'E', 'F'])
+        cls.assertEqual(cls.mapped.get('B'), ['C', 'D'])
+        cls.assertIn('F', cls.mapped)
+        cls.assertNotIn('G', cls.mapped)
+        cls.assertNotIn(1, cls.mapped)
+
+    def test_pickle_reopens_file(cls):
+        copy = pickle.loads(pickle.dumps(cls.mapped))
+        cls.assertEqual(copy.get('A'), ['B', 'C'])
+        copy.close()
+
+
+class WeightedGraphSearchTest(unittest.TestCase):
+    graph = {
+        'A': {'B': 1, 'C': 4},
+        'B': {'C': 1, 'D': 5},
+        'C': {'D': 1},
+        'D': {},
+        'E': {'A': 1},
+    }
+    coords = {'A': 0, 'B': 1, 'C': 2, 'D': 3, 'E': -1}
+
+    def setUp(self):
+        self.search = GraphSearch(self.graph)
+
+    def heuristic(self, node, end):
+        return abs(self.coords[end] - self.coords[node])
+
+    def test_dijkstra(self):
+        self.assertEqual(self.search.find_cheapest_path('A', 'D'), (['A', 'B', 'C', 'D'], 3))
+
+    def test_astar(self):
+        self.assertEqual(self.search.find_path_astar('E', 'D', self.heuristic), (['E', 'A', 'B', 'C', 'D'], 4))
+
+    def test_unreachable(self):
+        self.assertEqual(self.search.find_cheapest_path('D', 'A'), (None, float('inf')))
+        self.assertEqual(self.search.find_cheapest_path('A', 'Z'), (None, float('inf')))
+
+    def test_same_node(self):
+        self.assertEqual(self.search.find_cheapest_path('A', 'A'), (['A'], 0))
+
+    def test_unweighted_searches_use_neighbour_keys(self):
+        path = self.search.find_shortest_path('A', 'D')
+        self.assertEqual(len(path), 3)
+        self.assertTrue(is_path(self.graph, path, 'A', 'D'))
+
+    def test_negative_cost_is_rejected(self):
+        with self.assertRaises(ValueError):
+            GraphSearch({'A': {'B': -1}}).find_cheapest_path('A', 'B')
+
+
+class CompactWeightedGraphSearchTest(WeightedGraphSearchTest):
+    def setUp(self):
+        self.search = GraphSearch(CompactGraph.from_dict(self.graph))
+
+
+class SectionTest(unittest.TestCase):
+    def test_reads_like_a_sequence(self):
+        section = _Section(b'\x00' * 8 + struct.pack('=4q', 5, 6, 7, 8), 8, 'q', 4)
+        self.assertEqual((len(section), section[0], section[-1]), (4, 5, 8))
+        self.assertEqual((tuple(section[1:3]), tuple(section[::2]), list(section)), ((6, 7), (5, 7), [5, 6, 7, 8]))
+        self.assertRaises(IndexError, section.__getitem__, 4)
+
+
+class MappedWeightedGraphSearchTest(WeightedGraphSearchTest):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'graph.bin')
+        save_graph(self.graph, path)
+        self.mapped = load_graph(path)
+        self.search = GraphSearch(self.mapped)
+
+    def tearDown(self):
+        self.search = None
+        self.mapped.close()
+        shutil.rmtree(self.directory)
+
+    def test_not_a_graph_file(self):
+        path = os.path.join(self.directory, 'other.bin')
+        with open(path, 'wb') as f:
+            f.write(b'\x00' * 64)
+        with self.assertRaises(ValueError):
+            MappedGraph(path)
+
+
+class CompactGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.compact = CompactGraph.from_dict({'A': ['B', 'C'], 'B': ['C'], 'C': []})
+
+    def test_nodes_are_interned(self):
+        self.assertEqual(len(self.compact), 3)
+        self.assertEqual(self.compact.edge_count, 3)
+        self.assertEqual(self.compact.names[self.compact.index('B')], 'B')
+
+    def test_dict_like_access(self):
+        self.assertEqual(self.compact.get('A'), ['B', 'C'])
+        self.assertEqual(self.compact.get('C'), [])
+        self.assertIsNone(self.compact.get('Z'))
+        self.assertNotIn('Z', self.compact)
+
+    def test_adjacency_is_stored_in_arrays(self):
+        self.assertEqual(list(self.compact.offsets), [0, 2, 3, 3])
+        self.assertEqual(self.compact.offsets.typecode, 'i')
+        self.assertEqual(self.compact.targets.typecode, 'i')
+        self.assertIsNone(self.compact.weights)
+
+    def test_reverse(self):
+        reverse = self.compact.reverse()
+        self.assertEqual(reverse.get('C'), ['A', 'B'])
+        self.assertEqual(reverse.get('A'), [])
+        self.assertEqual(reverse.edge_count, self.compact.edge_count)
+
+    def test_weights(self):
+        compact = CompactGraph.from_dict({'A': {'B': 2.5}, 'B': {}})
+        self.assertEqual(compact.get('A'), {'B': 2.5})
+        self.assertEqual(compact.weights.typecode, 'd')
+        self.assertEqual(compact.reverse().get('B'), {'A': 2.5})
+
+
+class GraphSearchCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = {'A': ['B', 'C'], 'B': ['C', 'D'], 'C': ['D'], 'D': ['C']}
+        self.search = GraphSearch(self.graph, cache_size=2)
+
+    def test_repeated_query_hits_cache(self):
+        self.assertEqual(self.search.find_shortest_path('A', 'D'), ['A', 'B', 'D'])
+        self.assertEqual(self.search.find_shortest_path('A', 'D'), ['A', 'B', 'D'])
+        self.assertEqual(self.search.find_path('A', 'D', strategy='bfs'), ['A', 'B', 'D'])
+        self.assertEqual(self.search.cache_info(), (2, 1, 2, 1))
+
+    def test_methods_are_cached_separately(self):
+        self.search.find_path('A', 'D')
+        self.search.find_shortest_path('A', 'D')
+        self.assertEqual(self.search.cache_info().misses, 2)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.search.find_shortest_path('A', 'B')
+        self.search.find_shortest_path('A', 'C')
+        self.search.find_shortest_path('A', 'B')
+        self.search.find_shortest_path('A', 'D')
+        self.search.find_shortest_path('A', 'B')
+        self.assertEqual(self.search.cache_info(), (2, 3, 2, 2))
+        self.search.find_shortest_path('A', 'C')
+        self.assertEqual(self.search.cache_info().misses, 4)
+
+    def test_mutating_a_result_does_not_corrupt_cache(self):
+        self.search.find_all_path('A', 'D')[0].append('X')
+        self.search.find_shortest_path('A', 'D').append('X')
+        self.assertEqual(self.search.find_all_path('A', 'D')[0], ['A', 'B', 'C', 'D'])
+        self.assertEqual(self.search.find_shortest_path('A', 'D'), ['A', 'B', 'D'])
+
+    def test_add_edge_invalidates(self):
+        self.search.find_shortest_path('A', 'D')
+        self.search.add_edge('A', 'D')
+        self.assertEqual(self.graph['A'], ['B', 'C', 'D'])
+        self.assertEqual(self.search.find_shortest_path('A', 'D'), ['A', 'D'])
+        self.assertEqual(self.search.cache_info().misses, 2)
+
+    def test_remove_edge_invalidates(self):
+        path = self.search.find_path('A', 'D', strategy='bidirectional')
+        self.assertEqual(len(path), 3)
+        self.assertTrue(is_path(self.graph, path, 'A', 'D'))
+        self.search.remove_edge('B', 'D')
+        self.assertEqual(self.search.find_path('A', 'D', strategy='bidirectional'), ['A', 'C', 'D'])
+        with self.assertRaises(KeyError):
+            self.search.remove_edge('B', 'D')
+
+    def test_weighted_mutators(self):
+        search = GraphSearch({'A': {'B': 5}}, cache_size=8)
+        self.assertEqual(search.find_cheapest_path('A', 'B'), (['A', 'B'], 5))
+        search.add_edge('A', 'C', 1)
+        search.add_edge('C', 'B', 1)
+        self.assertEqual(search.find_cheapest_path('A', 'B'), (['A', 'C', 'B'], 2))
+        with self.assertRaises(ValueError):
+            GraphSearch({'A': []}).add_edge('A', 'B', 3)
+
+    def test_compact_graph_is_read_only(self):
+        search = GraphSearch(CompactGraph.from_dict(self.graph))
+        with self.assertRaises(TypeError):
+            search.add_edge('A', 'D')
+
+    def test_no_cache_by_default(self):
+        search = GraphSearch(self.graph)
+        search.find_shortest_path('A', 'D')
+        self.assertEqual(search.cache_info(), (0, 0, None, 0))
+
+
+class BatchShortestPathsTest(unittest.TestCase):
+    graph = {'A': ['B', 'C'], 'B': ['C', 'D'], 'C': ['D'], 'D': ['C'], 'E': ['F'], 'F': ['C']}
+
+    def test_all_reachable_targets(self):
+        results = list(GraphSearch(self.graph).batch_shortest_paths(['A', 'D'], workers=1))
+        expected = [
+            ('A', {'A': ['A'], 'B': ['A', 'B'], 'C': ['A', 'C'], 'D': ['A', 'B', 'D']}),
+            ('D', {'D': ['D'], 'C': ['D', 'C']}),
+        ]
+        self.assertEqual(results, expected)
+
+    def test_selected_targets(self):
+        results = dict(GraphSearch(self.graph).batch_shortest_paths('ABEZ', targets='DZ', workers=1))
+        expected = {
+            'A': {'D': ['A', 'B', 'D']},
+            'B': {'D': ['B', 'D']},
+            'E': {'D': ['E', 'F', 'C', 'D']},
+            'Z': {'Z': ['Z']},
+        }
+        self.assertEqual(results, expected)
+
+    def test_empty_compact_graph(self):
+        results = list(GraphSearch(CompactGraph.from_dict({})).batch_shortest_paths(['A'], workers=1))
+        self.assertEqual(results, [('A', {'A': ['A']})])
+
+    def test_process_pool_matches_single_process(self):
+        search = GraphSearch(CompactGraph.from_dict(self.graph))
+        sources = sorted(self.graph) * 3
+        expected = list(search.batch_shortest_paths(sources, targets='CD', workers=1))
+        self.assertEqual(list(search.batch_shortest_paths(sources, targets='CD', workers=2)), expected)
+        self.assertEqual([s for s, _ in expected], sources)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.check_output([sys.executable, '-c', code], env=env).decode().strip()
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'module __getattr__ (PEP 562) requires python 3.7')
+class LazyImportTest(unittest.TestCase):
+    def test_package_import_loads_no_pattern_module(self):
+        code = (
+            "import sys, patterns.behavioral, patterns.creational, patterns.structural, patterns.other\n"
+            "print(sorted(m for m in sys.modules if m.startswith('patterns')))"
+        )
+        expected = "['patterns', 'patterns.behavioral', 'patterns.creational', 'patterns.other', 'patterns.structural']"
+        self.assertEqual(run(code), expected)
+
+    def test_attribute_access_loads_only_its_module(self):
+        code = (
+            "import sys, patterns.behavioral\n"
+            "print(patterns.behavioral.Provider.__module__)\n"
+            "print(sorted(m for m in sys.modules if m.startswith('patterns.behavioral.')))"
+        )
+        expected = ['patterns.behavioral.publish_subscribe', "['patterns.behavioral.publish_subscribe']"]
+        self.assertEqual(run(code).splitlines(), expected)
+
+    def test_submodules_and_from_import(self):
+        from patterns.creational import BoundedPool
+        import patterns
+        from patterns.creational.pool import BoundedPool as imported
+
+        self.assertIs(BoundedPool, imported)
+        self.assertEqual(patterns.structural.BusinessLogic.__module__, 'patterns.structural.3-tier')
+        self.assertIn('GraphSearch', dir(patterns.other))
+        self.assertEqual(patterns.other.graph_search.GraphSearch, patterns.other.GraphSearch)
+
+    def test_unknown_attribute(self):
+        import patterns.behavioral
+
+        with self.assertRaises(AttributeError):
+            patterns.behavioral.NoSuchPattern